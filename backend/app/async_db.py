@@ -0,0 +1,37 @@
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from .db import DATABASE_PATH, READ_POOL_SIZE, SQL_ECHO, set_sqlite_pragmas
+'''
+Versão async da camada de banco, usada quando ASYNC_DB=1 (precisa do pacote aiosqlite).
+As rotas async (routers/async_*.py) não ocupam uma thread do threadpool enquanto
+esperam o banco. Os pragmas e o pool separado de leitura são os mesmos do db.py.
+'''
+
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DATABASE_PATH}"
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=SQL_ECHO)
+
+# Pool separado só para leitura, usado pelas rotas GET
+async_read_engine = create_async_engine(ASYNC_DATABASE_URL, echo=SQL_ECHO, pool_size=READ_POOL_SIZE)
+
+
+@event.listens_for(async_engine.sync_engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    set_sqlite_pragmas(dbapi_connection)
+
+
+@event.listens_for(async_read_engine.sync_engine, "connect")
+def _on_read_connect(dbapi_connection, connection_record):
+    set_sqlite_pragmas(dbapi_connection, read_only=True)
+
+
+# expire_on_commit=False para não disparar lazy load (que não existe em async) depois do commit
+async def get_async_session():
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
+async def get_async_read_session():
+    async with AsyncSession(async_read_engine, expire_on_commit=False) as session:
+        yield session
@@ -0,0 +1,185 @@
+from datetime import datetime, timedelta
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy import delete
+from sqlmodel import Session, select
+from typing import Optional, Tuple
+from .cache import MISSING, TTLCache
+from . import coherence
+from .db import read_engine
+from .models import UserSession
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+'''
+Login com senha com hash e token de sessão opaco (Authorization: Bearer <token>).
+
+Senha: PBKDF2-SHA256 da hashlib, com salt aleatório, guardada como
+    pbkdf2_sha256$<iterações>$<salt>$<hash>
+O hash é lento de propósito, então nunca roda no event loop: as rotas sync já rodam
+no threadpool e as async chamam pelo asyncio.to_thread. Senhas antigas em texto puro
+(rede.db) ainda funcionam e são trocadas pelo hash no primeiro login.
+
+Token: secrets.token_urlsafe, devolvido só no login. No banco (tabela UserSession) fica
+apenas o sha256 do token. O get_current_user_id procura o token primeiro no session_cache
+(LRU com TTL, em memória) e só vai no banco quando não acha, então a maioria das
+requisições autenticadas não faz nenhuma query para saber quem é o usuário.
+Tokens que não existem ficam num cache separado e pequeno (unknown_tokens), para um
+cliente mandando tokens aleatórios não tirar do session_cache as sessões válidas.
+O logout apaga a sessão do banco e do cache deste processo e incrementa a geração do
+cache: uma requisição que leu a sessão do banco antes do DELETE não grava mais a
+sessão no cache depois do logout. Com vários workers (app.serve)
+o DELETE vai para o log compartilhado e os outros processos apagam a entrada no próximo
+sync, feito antes de cada consulta ao session_cache (ver coherence.py).
+'''
+
+PASSWORD_SCHEME = "pbkdf2_sha256"
+PASSWORD_ITERATIONS = int(os.getenv("PASSWORD_ITERATIONS", "260000"))
+SESSION_DAYS = int(os.getenv("SESSION_DAYS", "30"))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "300"))
+
+UNKNOWN_TOKEN_CACHE_SIZE = int(os.getenv("UNKNOWN_TOKEN_CACHE_SIZE", "1000"))
+
+# token_hash -> (user_id, expires_at)
+session_cache = TTLCache(SESSION_CACHE_SIZE, SESSION_CACHE_TTL)
+# token_hash -> None, para tokens que não estão no banco
+unknown_tokens = TTLCache(UNKNOWN_TOKEN_CACHE_SIZE, SESSION_CACHE_TTL)
+
+# Incrementada a cada sessão esquecida (logout); ver get_current_user_id
+_generation = 0
+_generation_lock = threading.Lock()
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode()
+
+
+def hash_password(password: str, iterations: int = PASSWORD_ITERATIONS) -> str:
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return f"{PASSWORD_SCHEME}${iterations}${_b64(salt)}${_b64(digest)}"
+
+
+def verify_password(password: str, stored: Optional[str]) -> bool:
+    if stored is None:
+        # usuário não existe: calcula um hash à toa para o login demorar o mesmo tempo
+        hashlib.pbkdf2_hmac("sha256", password.encode(), bytes(16), PASSWORD_ITERATIONS)
+        return False
+    if not stored.startswith(PASSWORD_SCHEME + "$"):
+        # senha antiga, salva em texto puro
+        return hmac.compare_digest(password.encode(), stored.encode())
+    _, iterations, salt, expected = stored.split("$")
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), base64.b64decode(salt), int(iterations))
+    return hmac.compare_digest(_b64(digest), expected)
+
+
+def needs_rehash(stored: str) -> bool:
+    # Texto puro ou menos iterações que o configurado hoje
+    if not stored.startswith(PASSWORD_SCHEME + "$"):
+        return True
+    return int(stored.split("$")[1]) < PASSWORD_ITERATIONS
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def new_session(user_id: int) -> Tuple[str, UserSession]:
+    # Devolve o token (vai só para o cliente) e a linha da sessão (com o hash) para salvar
+    token = secrets.token_urlsafe(32)
+    record = UserSession(
+        token_hash=token_digest(token),
+        user_id=user_id,
+        expires_at=datetime.utcnow() + timedelta(days=SESSION_DAYS),
+    )
+    return token, record
+
+
+def remember_session(record: UserSession):
+    session_cache.set(record.token_hash, (record.user_id, record.expires_at))
+
+
+def forget_session(token_hash: str):
+    global _generation
+    with _generation_lock:
+        _generation += 1
+        session_cache.invalidate(token_hash)
+
+
+def forget_all_sessions():
+    global _generation
+    with _generation_lock:
+        _generation += 1
+        session_cache.clear()
+
+
+def _cache_loaded_session(token_hash: str, cached, generation: int):
+    # Se alguma sessão foi esquecida enquanto esta era lida do banco, ela pode ser a do logout
+    if cached is None:
+        unknown_tokens.set(token_hash, None)
+        return
+    with _generation_lock:
+        if generation == _generation:
+            session_cache.set(token_hash, cached)
+
+
+def login_response(user_id: int, token: str, record: UserSession) -> dict:
+    return {
+        "message": "Login realizado com sucesso!",
+        "user_id": user_id,
+        "access_token": token,
+        "token_type": "bearer",
+        "expires_at": record.expires_at,
+    }
+
+
+def expired_sessions_statement(user_id: int):
+    return select(UserSession).where(UserSession.user_id == user_id, UserSession.expires_at < datetime.utcnow())
+
+
+def delete_session_statement(token_hash: str):
+    return delete(UserSession).where(UserSession.token_hash == token_hash)
+
+
+def session_statement(token_hash: str):
+    return select(UserSession.user_id, UserSession.expires_at).where(UserSession.token_hash == token_hash)
+
+
+def _load_session(token_hash: str):
+    with Session(read_engine) as session:
+        row = session.exec(session_statement(token_hash)).first()
+    return tuple(row) if row else None
+
+
+def _unauthorized(detail: str):
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+
+async def get_current_user_id(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)) -> int:
+    # Dependência das rotas de escrita: devolve o id do usuário dono do token
+    if credentials is None:
+        raise _unauthorized("Faça login para continuar.")
+    token_hash = token_digest(credentials.credentials)
+    # Aplica os logouts feitos nos outros workers antes de olhar o cache (numa thread)
+    await coherence.log.async_sync()
+    generation = _generation
+    cached = session_cache.get(token_hash)
+    if cached is MISSING:
+        cached = unknown_tokens.get(token_hash)
+    if cached is MISSING:
+        cached = await asyncio.to_thread(_load_session, token_hash)
+        _cache_loaded_session(token_hash, cached, generation)
+    if cached is None or cached[1] < datetime.utcnow():
+        raise _unauthorized("Sessão inválida ou expirada.")
+    return cached[0]
+
+
+coherence.log.on("session", lambda change: forget_session(change.token_hash))
+coherence.log.on_reset(forget_all_sessions)
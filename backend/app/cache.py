@@ -0,0 +1,233 @@
+from collections import OrderedDict
+from fastapi import Request, Response
+from typing import Any, Hashable, Optional, Tuple
+from . import coherence
+import hashlib
+import os
+import secrets
+import threading
+import time
+'''
+Cache em memória (por processo) para as leituras mais pedidas:
+    ("feed", sort, ranking, limit, cursor)
+                                        página anônima do feed (sem a reação do usuário)
+    ("reactions", user_id, post_ids)    reações de um usuário nos posts de uma página
+    ("summary", post_id)                resumo de likes de um post (GET /likes/post/{post_id})
+
+Cada entrada sai por LRU (quando passa de maxsize) ou por TTL.
+Toda escrita (create_post, update_post, delete_post, toggle_like) chama on_post_changed ou
+on_reaction_changed, que apagam as entradas afetadas e incrementam a versão do cache.
+O ETag das respostas é montado a partir dessa versão, então um If-None-Match com o ETag
+atual recebe 304 sem nenhuma query no banco. A versão fica só na memória e recomeça do 0
+quando o processo sobe de novo, por isso o ETag também leva o BOOT_ID, sorteado a cada
+vez que o app sobe: um ETag guardado pelo cliente antes de reiniciar nunca vale depois,
+mesmo que a versão volte ao mesmo número.
+
+O recálculo periódico do hot_score (ranking.py) só muda a ordem das páginas sort=hot, então
+ele não mexe nessa versão: incrementa a versão do ranking, que entra na chave e no ETag só
+das páginas hot (feed_key), e apaga só as entradas ("feed", "hot", ...). As páginas new e top
+e os resumos continuam em cache e com o mesmo ETag.
+
+Com vários workers (app.serve) as versões vêm do log compartilhado (coherence.py): a do
+conteúdo é o id da última mudança em posts e reações, e a do ranking o id do último
+recálculo. As escritas de qualquer worker chegam aqui pelos handlers registrados no fim
+deste arquivo, e current_version() sincroniza com o log antes de cada leitura (nas rotas
+async, await current_version_async(), que faz o sync numa thread). As escritas não precisam
+sincronizar: a mudança já está no log e a próxima leitura aplica.
+'''
+
+FEED_CACHE_SIZE = int(os.getenv("FEED_CACHE_SIZE", "1024"))
+FEED_CACHE_TTL = float(os.getenv("FEED_CACHE_TTL", "30"))
+# Com vários workers o app.serve sorteia um só e passa para todos pelo ambiente,
+# para o If-None-Match valer em qualquer worker
+BOOT_ID = os.getenv("APP_BOOT_ID") or secrets.token_hex(4)
+
+MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return MISSING
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, version: Optional[int] = None):
+        # Se a versão mudou enquanto o valor era calculado, ele pode estar velho: não guarda
+        with self._lock:
+            if version is not None and version != _version:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_prefix(self, prefix: tuple):
+        with self._lock:
+            keys = [key for key in self._data if key[:len(prefix)] == prefix]
+            for key in keys:
+                del self._data[key]
+            self.invalidations += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "version": _version,
+            }
+
+
+feed_cache = TTLCache(FEED_CACHE_SIZE, FEED_CACHE_TTL)
+
+_version = 0
+_ranking_version = 0
+_version_lock = threading.Lock()
+
+
+def current_version() -> int:
+    if coherence.log.enabled:
+        coherence.log.sync()
+    return _version
+
+
+async def current_version_async() -> int:
+    await coherence.log.async_sync()
+    return _version
+
+
+def bump_version() -> int:
+    global _version
+    with _version_lock:
+        _version += 1
+        return _version
+
+
+def feed_key(sort: str, limit: int, cursor: Optional[str]) -> tuple:
+    # Só as páginas hot dependem do recálculo do hot_score; new e top usam ranking 0
+    ranking = _ranking_version if sort == "hot" else 0
+    return ("feed", sort, ranking, limit, cursor)
+
+
+def _invalidate_ranking():
+    feed_cache.invalidate_prefix(("feed", "hot"))
+
+
+def _invalidate_post(post_id: Optional[int] = None):
+    feed_cache.invalidate_prefix(("feed",))
+    if post_id is not None:
+        feed_cache.invalidate(("summary", post_id))
+
+
+def _invalidate_reaction(post_id: int, user_id: int):
+    feed_cache.invalidate_prefix(("feed",))
+    feed_cache.invalidate_prefix(("reactions", user_id))
+    feed_cache.invalidate(("summary", post_id))
+
+
+# Invalidação, chamada pelas rotas de escrita depois do commit
+# (com vários workers a mudança já está no log pelos triggers e o próximo sync aplica)
+def on_post_changed(post_id: Optional[int] = None):
+    if coherence.log.enabled:
+        return
+    bump_version()
+    _invalidate_post(post_id)
+
+
+def on_reaction_changed(post_id: int, user_id: int):
+    if coherence.log.enabled:
+        return
+    bump_version()
+    _invalidate_reaction(post_id, user_id)
+
+
+def on_scores_refreshed():
+    # Recálculo do hot_score (ranking.py); não passa pelos triggers, então vai para o log aqui
+    global _ranking_version
+    if coherence.log.enabled:
+        coherence.log.append("ranking")
+        return
+    with _version_lock:
+        _ranking_version += 1
+    _invalidate_ranking()
+
+
+# ETag / If-None-Match
+def make_etag(version: int, *key: Hashable) -> str:
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+    return f'W/"{BOOT_ID}-{version}-{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+# Mudanças vindas do log compartilhado (só com vários workers, ver coherence.py)
+CONTENT_KINDS = ("post_created", "post_updated", "post_deleted", "reaction")
+
+
+def _set_versions(latest: dict):
+    global _version, _ranking_version
+    with _version_lock:
+        _version = max(latest.get(kind, 0) for kind in CONTENT_KINDS)
+        _ranking_version = latest.get("ranking", 0)
+
+
+coherence.log.on_version(_set_versions)
+coherence.log.on_reset(feed_cache.clear)
+coherence.log.on("ranking", lambda change: _invalidate_ranking())
+for _kind in ("post_created", "post_updated", "post_deleted"):
+    coherence.log.on(_kind, lambda change: _invalidate_post(change.post_id))
+coherence.log.on("reaction", lambda change: _invalidate_reaction(change.post_id, change.user_id))
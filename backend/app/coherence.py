@@ -0,0 +1,193 @@
+from collections import defaultdict, namedtuple
+from typing import Callable, Dict, List, Optional
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+'''
+Coerência dos caches em memória quando o app roda com vários workers (python -m app.serve).
+
+Cada worker é um processo com o seu feed_cache, session_cache e barramento de eventos.
+Para um worker saber o que os outros mudaram, sem nenhum serviço externo, toda escrita
+deixa uma linha na tabela cacheinvalidation (o log), na mesma transação da mudança:
+    post_created / post_updated / post_deleted   INSERT/UPDATE/DELETE em post
+    reaction                                     INSERT/UPDATE/DELETE em like
+    session                                      DELETE em usersession (logout)
+    ranking                                      recálculo do hot_score (append explícito)
+As linhas vêm de TEMP TRIGGERs criados em cada conexão de escrita dos workers (ver db.py),
+então as rotas não mudam e o log só existe no modo com vários workers.
+
+Antes de usar um cache, o worker chama log.sync(): o PRAGMA data_version da conexão
+dedicada do log só muda quando outra conexão fez commit no banco, então na maioria das
+vezes o sync é essa leitura e nada mais. Quando muda, as linhas novas do log são aplicadas
+em ordem pelos handlers registrados (cache.py, auth.py, events.py).
+O sync faz I/O no SQLite e espera o lock de outro sync, então nunca roda no event loop:
+as rotas sync já estão no threadpool, e o código async usa await log.async_sync(), que
+roda o sync numa thread. Os handlers só mexem na memória (apagam entradas, guardam ids
+para o events.py); nenhum faz query, para o sync, que segura o lock, ser curto. O log guarda o id da
+última linha de cada kind (latest), e o cache.py monta as suas versões a partir dele (a
+do conteúdo, usada nos ETags, e a do ranking, só das páginas hot): dois workers com o mesmo
+latest têm o mesmo conteúdo, então um If-None-Match vale em qualquer worker.
+Uma leitura logo depois de um create_post ou toggle_like, em qualquer worker, já vê a mudança.
+
+O log é podado de tempos em tempos (prune), mantendo as últimas COHERENCE_LOG_KEEP linhas
+e a última de cada kind.
+Se um worker ficou tanto tempo parado que perdeu linhas, ele percebe o buraco nos ids
+(em qualquer ponto entre a sua versão e a última linha) e limpa os caches inteiros (reset).
+'''
+
+# Definido pelo app.serve; com 1 worker tudo aqui fica desligado
+APP_WORKERS = int(os.getenv("APP_WORKERS", "1"))
+COHERENCE_LOG_KEEP = int(os.getenv("COHERENCE_LOG_KEEP", "100000"))
+COHERENCE_PRUNE_SECONDS = float(os.getenv("COHERENCE_PRUNE_SECONDS", "60"))
+
+LOG_TABLE = "cacheinvalidation"
+
+# (nome, evento, tabela, colunas do log)
+TRIGGERS = (
+    ("post_insert", "INSERT", "post", "'post_created', NEW.id, NULL, NULL"),
+    ("post_update", "UPDATE OF content, image_url, video_url", "post", "'post_updated', NEW.id, NULL, NULL"),
+    ("post_delete", "DELETE", "post", "'post_deleted', OLD.id, NULL, NULL"),
+    ("like_insert", "INSERT", '"like"', "'reaction', NEW.post_id, NEW.user_id, NULL"),
+    ("like_update", "UPDATE", '"like"', "'reaction', NEW.post_id, NEW.user_id, NULL"),
+    ("like_delete", "DELETE", '"like"', "'reaction', OLD.post_id, OLD.user_id, NULL"),
+    ("session_delete", "DELETE", "usersession", "'session', NULL, NULL, OLD.token_hash"),
+)
+
+Change = namedtuple("Change", "id kind post_id user_id token_hash")
+
+logger = logging.getLogger("app.coherence")
+
+
+def install_triggers(dbapi_connection):
+    # Chamado pelo db.py em cada conexão de escrita; antes das migrações a tabela ainda não existe
+    cursor = dbapi_connection.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (LOG_TABLE,))
+    if cursor.fetchone():
+        for name, event, table, values in TRIGGERS:
+            cursor.execute(
+                f"CREATE TEMP TRIGGER IF NOT EXISTS coherence_{name} AFTER {event} ON main.{table} "
+                f"BEGIN INSERT INTO {LOG_TABLE} (kind, post_id, user_id, token_hash) VALUES ({values}); END"
+            )
+    else:
+        logger.warning("tabela %s não existe; aplique as migrações antes de subir os workers", LOG_TABLE)
+    cursor.close()
+
+
+class SharedLog:
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.version = 0
+        self.latest: Dict[str, int] = {}
+        self.resets = 0
+        self._connection: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+        self._lock = threading.Lock()
+        self._handlers = defaultdict(list)
+        self._reset_handlers: List[Callable[[], None]] = []
+        self._version_handlers: List[Callable[[Dict[str, int]], None]] = []
+
+    # Registro, feito no import dos módulos que têm cache
+    def on(self, kind: str, handler: Callable[[Change], None]):
+        self._handlers[kind].append(handler)
+
+    def on_reset(self, handler: Callable[[], None]):
+        self._reset_handlers.append(handler)
+
+    def on_version(self, handler: Callable[[Dict[str, int]], None]):
+        # Chamado depois de cada sync que mudou algo, com o id da última linha de cada kind
+        self._version_handlers.append(handler)
+
+    async def async_sync(self) -> int:
+        # Para o event loop (dependências e rotas async)
+        if not self.enabled:
+            return self.version
+        return await asyncio.to_thread(self.sync)
+
+    def _connect(self) -> sqlite3.Connection:
+        from .db import DATABASE_PATH, SQLITE_PRAGMAS
+
+        connection = sqlite3.connect(DATABASE_PATH, check_same_thread=False, isolation_level=None)
+        connection.execute(f"PRAGMA busy_timeout={SQLITE_PRAGMAS['busy_timeout']}")
+        connection.execute("PRAGMA query_only=ON")
+        return connection
+
+    def sync(self) -> int:
+        # Aplica as mudanças feitas por outras conexões (outros workers ou este) e devolve a versão
+        if not self.enabled:
+            return self.version
+        with self._lock:
+            if self._connection is None:
+                self._connection = self._connect()
+            data_version = self._connection.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return self.version
+            first_sync = self._data_version is None
+            self._data_version = data_version
+
+            if first_sync:
+                # Worker novo: os caches estão vazios, só pega as versões atuais
+                last = self._connection.execute(f"SELECT max(id) FROM {LOG_TABLE}").fetchone()[0]
+                self._load_latest(last or 0)
+                return self.version
+
+            rows = self._connection.execute(
+                f"SELECT id, kind, post_id, user_id, token_hash FROM {LOG_TABLE} WHERE id > ? ORDER BY id",
+                (self.version,),
+            ).fetchall()
+            if not rows:
+                return self.version
+            # Os ids do log são contíguos (rowid, um escritor por vez): se faltou algum entre a versão
+            # deste worker e a última linha, ele foi podado. Não basta olhar a primeira linha, porque
+            # a poda mantém linhas soltas no meio (a última de cada kind)
+            if rows[-1][0] - self.version != len(rows):
+                self.resets += 1
+                for handler in self._reset_handlers:
+                    handler()
+                self._load_latest(rows[-1][0])
+                return self.version
+            for row in rows:
+                change = Change(*row)
+                self.latest[change.kind] = change.id
+                for handler in self._handlers[change.kind]:
+                    handler(change)
+            self._set_version(rows[-1][0])
+            return self.version
+
+    def _load_latest(self, version: int):
+        # Última linha de cada kind até a versão (no primeiro sync e depois de um reset)
+        self.latest = dict(self._connection.execute(
+            f"SELECT kind, max(id) FROM {LOG_TABLE} WHERE id <= ? GROUP BY kind", (version,)
+        ).fetchall())
+        self._set_version(version)
+
+    def _set_version(self, version: int):
+        self.version = version
+        for handler in self._version_handlers:
+            handler(self.latest)
+
+    def append(self, kind: str, post_id: Optional[int] = None):
+        # Para mudanças que não passam pelos triggers (recálculo do hot_score)
+        from .db import engine
+
+        with engine.begin() as connection:
+            connection.exec_driver_sql(f"INSERT INTO {LOG_TABLE} (kind, post_id) VALUES (?, ?)", (kind, post_id))
+        self.sync()
+
+    def prune(self, engine) -> int:
+        # Mantém as últimas COHERENCE_LOG_KEEP linhas (a mais nova sempre fica, para o buraco ser
+        # detectado) e a última de cada kind, de onde um worker novo tira as versões (_load_latest)
+        with engine.begin() as connection:
+            result = connection.exec_driver_sql(
+                f"DELETE FROM {LOG_TABLE} WHERE id <= (SELECT max(id) FROM {LOG_TABLE}) - ? "
+                f"AND id NOT IN (SELECT max(id) FROM {LOG_TABLE} GROUP BY kind)",
+                (max(COHERENCE_LOG_KEEP, 1),),
+            )
+        return result.rowcount
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "version": self.version, "latest": dict(self.latest), "resets": self.resets}
+
+
+log = SharedLog(APP_WORKERS > 1)
@@ -1,12 +1,80 @@
 from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy import event
+from .ranking import register_functions
+from . import coherence
+import os
 '''
 create_engine é usado para criar a conexão com o banco de dados
 Session é usado para criar uma sessão com o banco de dados
 '''
 
-DATABASE_URL = "sqlite:///./rede.db" 
-engine = create_engine(DATABASE_URL, echo=True)
+DATABASE_PATH = os.getenv("DATABASE_PATH", "./rede.db")
+DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+
+# ASYNC_DB=1 liga as versões async das rotas (ver async_db.py, precisa do aiosqlite)
+ASYNC_DB = os.getenv("ASYNC_DB", "0") == "1"
+READ_POOL_SIZE = int(os.getenv("READ_POOL_SIZE", "10"))
+# SQL_ECHO=1 mostra cada statement SQL no terminal (só para depurar, deixa tudo mais lento)
+SQL_ECHO = os.getenv("SQL_ECHO", "0") == "1"
+
+'''
+Configuração das conexões SQLite:
+journal_mode=WAL deixa os leitores lerem enquanto alguém escreve (toggle_like, create_post),
+synchronous=NORMAL é seguro com WAL e faz menos fsync,
+busy_timeout faz a conexão esperar o lock em vez de falhar na hora com "database is locked",
+mmap_size lê o arquivo do banco por memória mapeada.
+As conexões de leitura ainda ganham query_only, para nenhuma rota GET escrever sem querer.
+Cada conexão também recebe a função decayed_score, usada para o hot_score (ver ranking.py).
+Com vários workers (app.serve), as conexões de escrita ganham os triggers do log de
+invalidação dos caches (ver coherence.py).
+'''
+SQLITE_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "mmap_size": 268435456,  # 256 MB
+}
+
+
+def set_sqlite_pragmas(dbapi_connection, read_only: bool = False):
+    cursor = dbapi_connection.cursor()
+    if not read_only:
+        cursor.execute("PRAGMA journal_mode=WAL")
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    if read_only:
+        cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+    register_functions(dbapi_connection)
+    if coherence.log.enabled and not read_only:
+        coherence.install_triggers(dbapi_connection)
+
+
+engine = create_engine(DATABASE_URL, echo=SQL_ECHO, connect_args={"check_same_thread": False})
+
+# Pool separado só para leitura, usado pelas rotas GET
+read_engine = create_engine(
+    DATABASE_URL,
+    echo=SQL_ECHO,
+    pool_size=READ_POOL_SIZE,
+    connect_args={"check_same_thread": False},
+)
+
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    set_sqlite_pragmas(dbapi_connection)
+
+
+@event.listens_for(read_engine, "connect")
+def _on_read_connect(dbapi_connection, connection_record):
+    set_sqlite_pragmas(dbapi_connection, read_only=True)
+
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+
+def get_read_session():
+    with Session(read_engine) as session:
+        yield session
@@ -0,0 +1,219 @@
+from sqlmodel import Session, select
+from typing import Any, Dict, List, Optional, Set, Tuple
+from .db import read_engine
+from .models import Post
+from . import coherence
+import asyncio
+import json
+import logging
+import os
+import threading
+'''
+Barramento de eventos em memória (por processo) para o GET /posts/stream (Server-Sent Events).
+
+As rotas de escrita publicam depois do commit:
+    post_created, post_updated, post_deleted   publish(), enviados na hora
+    reaction_counts                            publish_reaction(), agrupados
+As reações só marcam o post como alterado; a cada EVENTS_COALESCE_MS o _flush_reactions
+lê os contadores de todos os posts marcados numa query só e manda um reaction_counts por post.
+Um post recebendo centenas de likes por segundo gera no máximo um evento por intervalo.
+
+Cada cliente tem uma fila limitada (EVENTS_QUEUE_SIZE). Se o cliente não consome e a
+fila enche, ele para de receber eventos e, quando esvaziar a fila, recebe um evento
+`resync` para buscar o feed de novo. Assim um cliente lento não segura memória.
+Sem clientes conectados, publicar não faz nada.
+
+As rotas sync rodam no threadpool, então publish() entrega os eventos pelo
+call_soon_threadsafe do event loop registrado no start() (lifespan do main.py).
+As conexões SSE ficam abertas; ao parar o servidor use o --timeout-graceful-shutdown
+do uvicorn para não esperar os clientes desconectarem.
+
+Com vários workers (app.serve) o cliente SSE está ligado a um worker só, e a escrita pode
+ter acontecido em outro. Nesse modo o publish() das rotas não faz nada: os eventos saem do
+log compartilhado (coherence.py), que todo worker com clientes conectados lê a cada
+EVENTS_COALESCE_MS, e cada worker entrega aos seus próprios clientes. O handler do log só
+guarda (evento, post_id); os posts são lidos depois pelo _flush_reactions numa thread,
+com uma query só, fora do sync do log.
+'''
+
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+EVENTS_COALESCE_SECONDS = int(os.getenv("EVENTS_COALESCE_MS", "250")) / 1000
+EVENTS_HEARTBEAT_SECONDS = 15
+EVENTS_COUNTS_CHUNK = 500
+
+logger = logging.getLogger("app.events")
+
+
+def format_event(event: str, data: Any) -> str:
+    # Formato text/event-stream: "event: nome\ndata: json\n\n"
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class Subscriber:
+    __slots__ = ("queue", "lagged")
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(EVENTS_QUEUE_SIZE)
+        self.lagged = False
+
+
+class EventBus:
+    def __init__(self):
+        self._subscribers: Set[Subscriber] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._dirty: Set[int] = set()
+        self._changes: List[Tuple[str, int]] = []
+        self._dirty_lock = threading.Lock()
+        self.published = 0
+        self.lagged = 0
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._flusher = self._loop.create_task(self._flush_reactions())
+
+    def stop(self):
+        if self._flusher:
+            self._flusher.cancel()
+            self._flusher = None
+        self._loop = None
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber()
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def publish(self, event: str, data: Any):
+        # Pode ser chamado de qualquer thread; com vários workers o evento vem do log (publish_logged)
+        if coherence.log.enabled or not self._subscribers or self._loop is None:
+            return
+        message = format_event(event, data)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._dispatch(message)
+        else:
+            self._loop.call_soon_threadsafe(self._dispatch, message)
+
+    def publish_reaction(self, post_id: int):
+        if not self._subscribers:
+            return
+        with self._dirty_lock:
+            self._dirty.add(post_id)
+
+    def publish_logged(self, event: str, post_id: int):
+        # Evento de post vindo do log compartilhado (só com vários workers)
+        if not self._subscribers:
+            return
+        with self._dirty_lock:
+            self._changes.append((event, post_id))
+
+    def _dispatch(self, message: str):
+        # Roda no event loop; a mensagem já formatada é a mesma para todos os clientes
+        self.published += 1
+        for subscriber in list(self._subscribers):
+            if subscriber.lagged:
+                continue
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                subscriber.lagged = True
+                self.lagged += 1
+
+    async def _flush_reactions(self):
+        while True:
+            await asyncio.sleep(EVENTS_COALESCE_SECONDS)
+            if coherence.log.enabled and self._subscribers:
+                try:
+                    await asyncio.to_thread(coherence.log.sync)
+                except Exception:
+                    logger.exception("falha ao ler o log compartilhado")
+            with self._dirty_lock:
+                post_ids, self._dirty = self._dirty, set()
+                changes, self._changes = self._changes, []
+            if changes and self._subscribers:
+                try:
+                    await self._deliver_logged(changes)
+                except Exception:
+                    logger.exception("falha ao ler os posts dos eventos do log compartilhado")
+            if not post_ids or not self._subscribers:
+                continue
+            try:
+                rows = await asyncio.to_thread(_read_counts, post_ids)
+            except Exception:
+                logger.exception("falha ao ler os contadores para o reaction_counts")
+                continue
+            for post_id, likes_count, dislikes_count in rows:
+                self._dispatch(format_event(
+                    "reaction_counts",
+                    {"post_id": post_id, "likes_count": likes_count, "dislikes_count": dislikes_count},
+                ))
+
+    async def _deliver_logged(self, changes: List[Tuple[str, int]]):
+        # Se o post já foi apagado quando o evento sai, o post_deleted vem logo depois
+        wanted = {post_id for event, post_id in changes if event != "post_deleted"}
+        posts = await asyncio.to_thread(_read_posts, wanted) if wanted else {}
+        for event, post_id in changes:
+            if event == "post_deleted":
+                self._dispatch(format_event(event, {"id": post_id}))
+            elif post_id in posts:
+                self._dispatch(format_event(event, posts[post_id]))
+
+    def stats(self) -> dict:
+        return {"subscribers": len(self._subscribers), "published": self.published, "lagged": self.lagged}
+
+
+def _read_posts(post_ids) -> Dict[int, dict]:
+    post_ids = sorted(post_ids)
+    posts = {}
+    with Session(read_engine) as session:
+        for start in range(0, len(post_ids), EVENTS_COUNTS_CHUNK):
+            chunk = post_ids[start:start + EVENTS_COUNTS_CHUNK]
+            for post in session.exec(select(Post).where(Post.id.in_(chunk))):
+                posts[post.id] = post.model_dump(mode="json")
+    return posts
+
+
+def _read_counts(post_ids):
+    # Em blocos, para não passar do limite de parâmetros do SQLite num pico de reações
+    post_ids = sorted(post_ids)
+    rows = []
+    with Session(read_engine) as session:
+        for start in range(0, len(post_ids), EVENTS_COUNTS_CHUNK):
+            chunk = post_ids[start:start + EVENTS_COUNTS_CHUNK]
+            statement = select(Post.id, Post.likes_count, Post.dislikes_count).where(Post.id.in_(chunk))
+            rows += session.exec(statement).all()
+    return rows
+
+
+bus = EventBus()
+
+
+for _kind in ("post_created", "post_updated", "post_deleted"):
+    coherence.log.on(_kind, lambda change: bus.publish_logged(change.kind, change.post_id))
+coherence.log.on("reaction", lambda change: bus.publish_reaction(change.post_id))
+
+
+async def event_stream():
+    # Gerador do StreamingResponse; o comentário ": ping" mantém a conexão aberta em proxies
+    # Com vários workers, aplica o log antes de inscrever: o cliente só recebe o que mudar depois
+    await coherence.log.async_sync()
+    subscriber = bus.subscribe()
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            if subscriber.lagged and subscriber.queue.empty():
+                subscriber.lagged = False
+                yield format_event("resync", {})
+                continue
+            try:
+                yield await asyncio.wait_for(subscriber.queue.get(), EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+    finally:
+        bus.unsubscribe(subscriber)
@@ -1,33 +1,53 @@
-from fastapi import FastAPI  
-from .models import SQLModel   
-from .db import engine  
+from fastapi import APIRouter, FastAPI  
+from .db import ASYNC_DB, engine  
+from .migrations import migrate
+from .media import UPLOADS_DIR, move_legacy_media, shutdown_pool
+from .ranking import HOT_REFRESH_SECONDS, hot_score_refresher
+from .metrics import MetricsMiddleware
+from .events import bus
+from . import coherence
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from .routers import users, posts, likes
+import asyncio
+import os
+from .routers import users, posts, likes, stats, media
 from fastapi.staticfiles import StaticFiles
 
 '''
-SQLModel é importado do arquivo models.py
 engine é importado do arquivo db.py, vai servir para conectar o banco de dados
 users, posts e interactions são os rotas que foram definidos nos arquivos users.py, posts.py e interactions.py (os 3 arquivos estão na pasta routers)
 '''
 # esse ponto antes do import é para indicar que o arquivo está na mesma pasta que o main.py
 
-app = FastAPI() 
-
-@app.on_event("startup")  
-def on_startup():  
-    SQLModel.metadata.create_all(engine)
-'''
-essa parte vai criar as tabelas do banco de dados, todos eles definidos no arquivo 'models.py
-'''
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    SQLModel.metadata.create_all(engine)
+    migrate(engine)
+    if not coherence.log.enabled:
+        # as mídias não ficam mais dentro da pasta servida em /uploads; com vários workers o app.serve move antes
+        move_legacy_media()
+    # recalcula o hot_score periodicamente (o decaimento depende da hora atual);
+    # com vários workers quem recalcula é o processo do app.serve, uma vez só
+    refresher = None
+    if HOT_REFRESH_SECONDS > 0 and not coherence.log.enabled:
+        refresher = asyncio.create_task(hot_score_refresher(engine))
+    bus.start()  # eventos do GET /posts/stream
     yield
+    bus.stop()
+    if refresher:
+        refresher.cancel()
+    shutdown_pool()  # espera as miniaturas que ainda estão na fila
+    # fecha as conexões do pool (as do aiosqlite têm uma thread cada e seguram o processo aberto)
+    if ASYNC_DB:
+        from .async_db import async_engine, async_read_engine
+        await async_engine.dispose()
+        await async_read_engine.dispose()
 
 app = FastAPI(lifespan=lifespan)
+'''
+o lifespan aplica as migrações pendentes (migrations.py) antes do app aceitar requisições:
+cria as tabelas num banco novo e atualiza um rede.db antigo
+para rodar com vários workers use python -m app.serve (ver serve.py), que migra uma vez antes de subir os processos
+'''
 
 app.add_middleware(
     CORSMiddleware,
@@ -35,19 +55,48 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # o frontend roda em outra origem; sem isso o JS não lê o cursor da próxima página nem o ETag
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 '''
 facilidade o frontend com caminhos
 '''
+app.add_middleware(MetricsMiddleware)  # latência, SQL e tamanho de resposta por rota (ver /metrics)
+
+
+def sync_only_routes(sync_routers, async_routers) -> APIRouter:
+    # rotas sync que não têm versão async (mesmo caminho e método), para o modo ASYNC_DB
+    taken = {
+        (route.path_format, method)
+        for router in async_routers for route in router.routes for method in route.methods
+    }
+    only = APIRouter()
+    for router in sync_routers:
+        for route in router.routes:
+            if not any((route.path_format, method) in taken for method in route.methods):
+                only.routes.append(route)
+    return only
 
 
-app.include_router(users.router)
-app.include_router(posts.router)
-app.include_router(likes.router)
+if ASYNC_DB:
+    # só as rotas async, mais as que existem apenas na versão sync (/posts/search, /posts/stream);
+    # montar os dois routers inteiros deixava rotas sync mortas e operation ids duplicados no /docs
+    from .routers import async_users, async_posts, async_likes
+    async_routers = (async_users.router, async_posts.router, async_likes.router)
+    for router in async_routers:
+        app.include_router(router)
+    app.include_router(sync_only_routes((users.router, posts.router, likes.router), async_routers))
+else:
+    app.include_router(users.router)
+    app.include_router(posts.router)
+    app.include_router(likes.router)
+app.include_router(stats.router)
+app.include_router(media.router)
 
 
 
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads") # adição da opção de carregar imagens
+os.makedirs(UPLOADS_DIR, exist_ok=True)  # o StaticFiles exige que a pasta exista
+app.mount("/uploads", StaticFiles(directory=UPLOADS_DIR), name="uploads") # adição da opção de carregar imagens
 '''
 essa parte vai incluir os routers que foram definidos nos arquivos 'users.py', 'posts.py' e 'interactions.py'
 '''
@@ -0,0 +1,195 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from typing import Dict, Optional, Tuple
+import hashlib
+import importlib.util
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+'''
+Armazenamento das mídias dos posts (POST /posts/{post_id}/media), endereçado pelo conteúdo.
+
+O arquivo enviado chega em blocos (direto do corpo da requisição, ver routers/media.py)
+e o MediaWriter grava num arquivo temporário dentro de MEDIA_DIR, calculando o sha256 no
+caminho, e depois renomeia para <sha256><extensão>. Se já existe um arquivo com o mesmo hash, o temporário é
+descartado (deduplicação): o mesmo arquivo enviado várias vezes ocupa o disco uma vez só.
+
+Para imagens, as variantes (miniatura e tamanho médio, em webp) são geradas num pool
+de processos, fora da requisição. O Pillow é opcional: sem ele só o original é salvo.
+
+Como o nome do arquivo é o hash do conteúdo, ele nunca muda, e GET /media/{name} pode
+mandar Cache-Control immutable de um ano.
+
+MEDIA_DIR fica fora do UPLOADS_DIR (que o main.py monta em /uploads): dentro dele as mídias
+também saíam por /uploads/media/..., sem o Cache-Control immutable, junto com os .part dos
+uploads em andamento. Por padrão é a pasta "media" ao lado do UPLOADS_DIR.
+'''
+
+UPLOADS_DIR = os.getenv("UPLOADS_DIR", "uploads")
+MEDIA_DIR = os.getenv("MEDIA_DIR") or os.path.join(os.path.dirname(os.path.abspath(UPLOADS_DIR)), "media")
+# onde as mídias ficavam antes (ver move_legacy_media)
+LEGACY_MEDIA_DIR = os.path.join(UPLOADS_DIR, "media")
+MEDIA_MAX_BYTES = int(os.getenv("MEDIA_MAX_MB", "100")) * 1024 * 1024
+MEDIA_WORKERS = int(os.getenv("MEDIA_WORKERS", "2"))
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+IMAGE_TYPES = {"image/jpeg": ".jpg", "image/png": ".png", "image/gif": ".gif", "image/webp": ".webp"}
+VIDEO_TYPES = {"video/mp4": ".mp4", "video/webm": ".webm", "video/quicktime": ".mov"}
+
+# nome da variante -> maior lado em pixels
+VARIANTS = {"thumb": 320, "medium": 1080}
+
+# sha256, sufixo opcional da variante e extensão; impede caminhos como ../../db
+MEDIA_NAME = re.compile(r"^[0-9a-f]{64}(_[a-z]+)?\.[a-z0-9]+$")
+
+logger = logging.getLogger("app.media")
+
+
+class MediaTooLarge(Exception):
+    pass
+
+
+def ensure_media_columns(connection: Connection):
+    # Bancos criados sem image_url/video_url (o create_all não altera tabelas existentes)
+    columns = {column["name"] for column in inspect(connection).get_columns("post")}
+    for name in ("image_url", "video_url"):
+        if name not in columns:
+            connection.execute(text(f"ALTER TABLE post ADD COLUMN {name} VARCHAR"))
+
+
+def move_legacy_media():
+    # Chamado no lifespan: leva as mídias de uploads/media para MEDIA_DIR, para saírem do /uploads
+    if not os.path.isdir(LEGACY_MEDIA_DIR):
+        return
+    if os.path.exists(MEDIA_DIR):
+        logger.warning("%s e %s existem; mova as mídias antigas manualmente", LEGACY_MEDIA_DIR, MEDIA_DIR)
+        return
+    shutil.move(LEGACY_MEDIA_DIR, MEDIA_DIR)
+
+
+def media_path(name: str) -> str:
+    # Os dois primeiros caracteres do hash viram subpasta, para não juntar tudo numa pasta só
+    return os.path.join(MEDIA_DIR, name[:2], name)
+
+
+def media_url(name: str) -> str:
+    return f"/media/{name}"
+
+
+def variant_name(digest: str, variant: str) -> str:
+    return f"{digest}_{variant}.webp"
+
+
+class MediaWriter:
+    # Recebe o upload em blocos (write) e grava num temporário de MEDIA_DIR, calculando o
+    # sha256 e parando em MEDIA_MAX_BYTES; o finish() dá o nome final ao arquivo.
+    # Usado com `with`: se sair sem finish() (erro, arquivo grande demais), o temporário é apagado
+    def __init__(self):
+        os.makedirs(MEDIA_DIR, exist_ok=True)
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self._file = tempfile.NamedTemporaryFile(dir=MEDIA_DIR, suffix=".part", delete=False)
+        self._finished = False
+
+    def __enter__(self) -> "MediaWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        if not self._finished:
+            self._file.close()
+            os.unlink(self._file.name)
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > MEDIA_MAX_BYTES:
+            raise MediaTooLarge()
+        self.digest.update(chunk)
+        self._file.write(chunk)
+
+    def finish(self, extension: str) -> Tuple[str, str, int, bool]:
+        # Retorna (sha256, nome do arquivo, tamanho, deduplicado)
+        self._file.close()
+        self._finished = True
+        digest = self.digest.hexdigest()
+        name = digest + extension
+        path = media_path(name)
+        if os.path.exists(path):
+            os.unlink(self._file.name)
+            return digest, name, self.size, True
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # rename atômico: dois uploads iguais ao mesmo tempo terminam no mesmo arquivo
+        os.replace(self._file.name, path)
+        return digest, name, self.size, False
+
+
+def make_variants(path: str, digest: str) -> Dict[str, str]:
+    # Roda nos processos do pool; por isso importa o Pillow aqui dentro
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return {}
+
+    created = {variant: variant_name(digest, variant) for variant in VARIANTS}
+    if all(os.path.exists(media_path(name)) for name in created.values()):
+        return created  # arquivo deduplicado, as variantes já existem
+    with Image.open(path) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        for variant, size in VARIANTS.items():
+            target = media_path(created[variant])
+            if not os.path.exists(target):
+                resized = image.copy()
+                resized.thumbnail((size, size))
+                partial = f"{target}.{os.getpid()}.part"  # dois processos podem gerar a mesma variante
+                resized.save(partial, "WEBP", quality=80)
+                os.replace(partial, target)
+    return created
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn em vez de fork: o processo do servidor tem threads (threadpool, aiosqlite)
+            _pool = ProcessPoolExecutor(MEDIA_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _log_failure(future):
+    global _pool
+    error = future.exception()
+    if error is not None:
+        logger.warning("falha ao gerar as variantes da mídia: %r", error)
+    if isinstance(error, BrokenProcessPool):
+        # um processo morreu (ex.: falta de memória); o próximo upload cria um pool novo
+        with _pool_lock:
+            _pool = None
+
+
+def schedule_variants(digest: str, name: str) -> Dict[str, str]:
+    # Agenda as variantes e já devolve as URLs delas; até ficarem prontas o GET dá 404
+    if importlib.util.find_spec("PIL") is None:
+        return {}
+    future = _get_pool().submit(make_variants, media_path(name), digest)
+    future.add_done_callback(_log_failure)
+    return {variant: media_url(variant_name(digest, variant)) for variant in VARIANTS}
+
+
+def shutdown_pool():
+    # Chamado no fim do lifespan; espera as variantes que já estão na fila
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
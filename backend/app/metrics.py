@@ -0,0 +1,168 @@
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from typing import Dict, Optional, Tuple
+import logging
+import os
+import threading
+import time
+'''
+Métricas de desempenho por rota, expostas em formato Prometheus em /metrics.
+
+O MetricsMiddleware mede cada requisição: latência, status, tamanho da resposta e,
+pelos eventos do SQLAlchemy (before/after_cursor_execute), quantos statements SQL
+foram executados e quanto tempo ficou no banco. Os eventos são registrados na classe
+Engine, então valem para todos os engines (sync, leitura e async).
+
+Uma requisição com mais de SQL_STATEMENTS_WARN statements gera um warning no log,
+para achar N+1 (um loop que faz uma query por item).
+'''
+
+SQL_STATEMENTS_WARN = int(os.getenv("SQL_STATEMENTS_WARN", "20"))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger("app.metrics")
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_time", "_started")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self._started = 0.0
+
+
+# Estatísticas da requisição atual; o objeto é compartilhado com as threads/greenlets da requisição
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is not None:
+        stats._started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_time += time.perf_counter() - stats._started
+
+
+class RouteMetrics:
+    __slots__ = ("requests", "statuses", "latency_sum", "buckets", "statements", "db_time", "response_bytes", "n_plus_one")
+
+    def __init__(self):
+        self.requests = 0
+        self.statuses: Dict[int, int] = {}
+        self.latency_sum = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.statements = 0
+        self.db_time = 0.0
+        self.response_bytes = 0
+        self.n_plus_one = 0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, method: str, route: str, status: int, latency: float, stats: RequestStats, response_bytes: int):
+        with self._lock:
+            metrics = self._routes.get((method, route))
+            if metrics is None:
+                metrics = self._routes[(method, route)] = RouteMetrics()
+            metrics.requests += 1
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            metrics.latency_sum += latency
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    metrics.buckets[index] += 1
+            metrics.statements += stats.statements
+            metrics.db_time += stats.db_time
+            metrics.response_bytes += response_bytes
+            if stats.statements > SQL_STATEMENTS_WARN:
+                metrics.n_plus_one += 1
+
+    def render(self) -> str:
+        # Formato texto do Prometheus (version 0.0.4)
+        lines = [
+            "# HELP http_requests_total Requisições por rota e status.",
+            "# TYPE http_requests_total counter",
+        ]
+        with self._lock:
+            routes = sorted(self._routes.items())
+            for (method, route), metrics in routes:
+                for status, count in sorted(metrics.statuses.items()):
+                    lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+
+            lines += [
+                "# HELP http_request_duration_seconds Latência das requisições.",
+                "# TYPE http_request_duration_seconds histogram",
+            ]
+            for (method, route), metrics in routes:
+                labels = f'method="{method}",route="{route}"'
+                for bound, count in zip(LATENCY_BUCKETS, metrics.buckets):
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {metrics.requests}')
+                lines.append(f"http_request_duration_seconds_sum{{{labels}}} {metrics.latency_sum:.6f}")
+                lines.append(f"http_request_duration_seconds_count{{{labels}}} {metrics.requests}")
+
+            counters = [
+                ("http_request_sql_statements_total", "Statements SQL executados.", "statements", "{}"),
+                ("http_request_db_seconds_total", "Tempo gasto no banco.", "db_time", "{:.6f}"),
+                ("http_response_size_bytes_total", "Bytes enviados no corpo das respostas.", "response_bytes", "{}"),
+                ("http_request_n_plus_one_total", f"Requisições com mais de {SQL_STATEMENTS_WARN} statements SQL.", "n_plus_one", "{}"),
+            ]
+            for name, help_text, attribute, number in counters:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for (method, route), metrics in routes:
+                    value = number.format(getattr(metrics, attribute))
+                    lines.append(f'{name}{{method="{method}",route="{route}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    # Middleware ASGI puro (sem BaseHTTPMiddleware), não atrapalha StreamingResponse
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+        response_bytes = 0
+
+        async def send_wrapper(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            latency = time.perf_counter() - started
+            route = scope.get("route")
+            # rotas não encontradas ficam juntas, para não criar uma série por URL
+            path = getattr(route, "path", None) or "<unmatched>"
+            registry.observe(scope["method"], path, status, latency, stats, response_bytes)
+            if stats.statements > SQL_STATEMENTS_WARN:
+                logger.warning(
+                    "%s %s executou %d statements SQL (%.1f ms no banco); possível N+1",
+                    scope["method"], scope["path"], stats.statements, stats.db_time * 1000,
+                )
@@ -0,0 +1,207 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from typing import Sequence
+from .reconcile import ensure_counter_columns, reconcile_counters
+from .media import ensure_media_columns
+from .ranking import ensure_ranking_columns
+from .search import ensure_search_index
+import logging
+'''
+Migrações versionadas do esquema, aplicadas no startup (lifespan do main.py).
+
+A versão do banco fica no PRAGMA user_version (0 num banco novo ou num rede.db antigo).
+Cada migração com número maior que a versão atual roda na sua própria transação,
+junto com a atualização do user_version: se falhar, o banco fica na versão anterior.
+O driver sqlite3 (pysqlite) decide sozinho quando abrir e fechar transações e não
+coloca DDL nem PRAGMA dentro delas, então o engine.begin() não basta: a conexão das
+migrações fica em AUTOCOMMIT (o driver não mexe em nada) e o BEGIN IMMEDIATE / COMMIT /
+ROLLBACK são mandados aqui. O IMMEDIATE pega o lock de escrita na hora, e a versão é lida
+de novo dentro da transação: dois processos migrando juntos não aplicam a mesma migração.
+As migrações verificam o que já existe antes de alterar (colunas, IF NOT EXISTS),
+então um rede.db criado pelo create_all antigo é atualizado sem perder dados.
+
+Cada migração tem o seu DDL escrito aqui (ou no módulo da funcionalidade), nunca o
+create_all dos models: os models mostram o esquema de hoje, e uma migração antiga que
+lesse deles criaria num banco novo tabelas e colunas que as migrações seguintes ainda
+vão criar ou alterar. A migração 1 é o esquema do create_all de antes das migrações.
+
+Para uma mudança nova no esquema, acrescente uma função no fim de MIGRATIONS, com o
+DDL explícito; nunca altere uma migração que já foi aplicada.
+
+Uso (dentro da pasta backend):
+    python -m app.migrations            aplica as migrações pendentes
+    python -m app.migrations --status   mostra a versão do banco e as pendentes
+'''
+
+logger = logging.getLogger("app.migrations")
+
+
+# Esquema do rede.db de antes das migrações (os models da época, sem contadores, mídias,
+# hot_score nem índices além do username)
+BASELINE_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS user (
+        id INTEGER NOT NULL,
+        username VARCHAR(20) NOT NULL,
+        password VARCHAR NOT NULL,
+        PRIMARY KEY (id)
+    )""",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_user_username ON user (username)",
+    """CREATE TABLE IF NOT EXISTS post (
+        id INTEGER NOT NULL,
+        content VARCHAR NOT NULL,
+        user_id INTEGER NOT NULL,
+        created_at DATETIME NOT NULL,
+        updated_at DATETIME,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES user (id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS "like" (
+        id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        post_id INTEGER NOT NULL,
+        type VARCHAR(7) NOT NULL,
+        created_at DATETIME NOT NULL,
+        PRIMARY KEY (id),
+        CONSTRAINT unique_user_post_like UNIQUE (user_id, post_id),
+        FOREIGN KEY(user_id) REFERENCES user (id),
+        FOREIGN KEY(post_id) REFERENCES post (id)
+    )""",
+]
+
+QUERY_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_post_user_id ON post (user_id)",
+    "CREATE INDEX IF NOT EXISTS ix_post_created_at_id ON post (created_at, id)",
+    'CREATE INDEX IF NOT EXISTS ix_like_post_id_type ON "like" (post_id, type)',
+]
+
+SESSION_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS usersession (
+        id INTEGER NOT NULL,
+        token_hash VARCHAR NOT NULL,
+        user_id INTEGER NOT NULL,
+        created_at DATETIME NOT NULL,
+        expires_at DATETIME NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES user (id)
+    )""",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_usersession_token_hash ON usersession (token_hash)",
+    "CREATE INDEX IF NOT EXISTS ix_usersession_user_id ON usersession (user_id)",
+]
+
+INVALIDATION_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS cacheinvalidation (
+        id INTEGER NOT NULL,
+        kind VARCHAR NOT NULL,
+        post_id INTEGER,
+        user_id INTEGER,
+        token_hash VARCHAR,
+        PRIMARY KEY (id)
+    )""",
+]
+
+
+def execute_all(connection: Connection, statements: Sequence[str]):
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def create_baseline_tables(connection: Connection):
+    # Num rede.db do create_all antigo as tabelas já existem e nada muda
+    execute_all(connection, BASELINE_SCHEMA)
+
+
+def create_query_indexes(connection: Connection):
+    # Índices de post.user_id, post(created_at, id) e like(post_id, type), também declarados nos models
+    execute_all(connection, QUERY_INDEXES)
+
+
+def create_session_table(connection: Connection):
+    execute_all(connection, SESSION_SCHEMA)
+
+
+def create_invalidation_table(connection: Connection):
+    execute_all(connection, INVALIDATION_SCHEMA)
+
+
+def reconcile_counts(connection: Connection):
+    # Bancos antigos ganharam likes_count/dislikes_count zerados na migração 2
+    reconcile_counters(connection, fix=True)
+
+
+# (versão, descrição, função)
+MIGRATIONS = [
+    (1, "tabelas user, post e like", create_baseline_tables),
+    (2, "contadores likes_count/dislikes_count", ensure_counter_columns),
+    (3, "colunas image_url/video_url", ensure_media_columns),
+    (4, "hot_score e índices do ranking", ensure_ranking_columns),
+    (5, "recalcula os contadores a partir da tabela like", reconcile_counts),
+    (6, "índice de busca FTS5", ensure_search_index),
+    (7, "índices de post.user_id, post.created_at e like(post_id, type)", create_query_indexes),
+    (8, "tabela usersession (tokens de login)", create_session_table),
+    (9, "tabela cacheinvalidation (log dos caches com vários workers)", create_invalidation_table),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(connection: Connection) -> int:
+    return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def pending_migrations(connection: Connection):
+    version = current_version(connection)
+    return [migration for migration in MIGRATIONS if migration[0] > version]
+
+
+def apply_migration(connection: Connection, version: int, function) -> bool:
+    # Roda uma migração e o user_version numa transação só; False se outro processo já aplicou
+    connection.exec_driver_sql("BEGIN IMMEDIATE")
+    try:
+        if current_version(connection) >= version:
+            connection.exec_driver_sql("ROLLBACK")
+            return False
+        function(connection)
+        connection.exec_driver_sql(f"PRAGMA user_version = {version}")
+    except BaseException:
+        connection.exec_driver_sql("ROLLBACK")
+        raise
+    connection.exec_driver_sql("COMMIT")
+    return True
+
+
+def migrate(engine: Engine) -> int:
+    # Aplica as migrações pendentes e devolve a versão final do banco
+    with engine.connect() as connection:
+        pending = pending_migrations(connection)
+    if pending:
+        with engine.connect() as connection:
+            connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+            for version, description, function in pending:
+                if apply_migration(connection, version, function):
+                    logger.info("migração %d aplicada: %s", version, description)
+            # atualiza as estatísticas do planejador depois de criar índices
+            connection.exec_driver_sql("PRAGMA optimize")
+    return pending[-1][0] if pending else LATEST_VERSION
+
+
+def main(argv=None):
+    import argparse
+    from .db import engine
+
+    parser = argparse.ArgumentParser(description="Migrações do esquema do banco.")
+    parser.add_argument("--status", action="store_true", help="só mostra a versão e as migrações pendentes")
+    args = parser.parse_args(argv)
+
+    with engine.connect() as connection:
+        version = current_version(connection)
+        pending = pending_migrations(connection)
+    print(f"Banco na versão {version} (última: {LATEST_VERSION}).")
+    for number, description, _ in pending:
+        print(f"  pendente {number}: {description}")
+    if not args.status and pending:
+        print(f"Migrado para a versão {migrate(engine)}.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
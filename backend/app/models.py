@@ -1,7 +1,7 @@
 from sqlmodel import SQLModel, Field
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime 
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import Index, UniqueConstraint
 import enum
 
 
@@ -16,7 +16,7 @@ no username temos o uso do index para facilitar buscas no banco de dados,
 o unique para garantir que não existam dois usuários com o mesmo nome, 
 já o nullable vai indicar que o campo não pode ser nulo.
 
-password é o campo que vai guardar a senha do usuário :D
+password é o campo que vai guardar a senha do usuário :D (o hash dela, ver auth.py)
 '''
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -34,6 +34,23 @@ class UserLogin(SQLModel):
     username: str
     password: str
 
+# UserPublic é o que as rotas devolvem de um usuário (sem a senha)
+class UserPublic(SQLModel):
+    id: int
+    username: str
+
+# UserSession vai representar as sessões de login (tokens), ver auth.py
+'''
+token_hash é o sha256 do token enviado no header Authorization: Bearer; o token em si não fica no banco.
+expires_at é quando o token deixa de valer.
+'''
+class UserSession(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    token_hash: str = Field(index=True, unique=True, nullable=False)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime
+
 #---------------------------------------------------------------------------------------------
 
 # 2 classes vão ser relacionadas a Post:
@@ -42,29 +59,45 @@ class UserLogin(SQLModel):
 id do posto segue o mesmo padrão do id do usuário, mas nesse caso o id começa em 1
 content é o conteúdo do post, que não pode ser nulo, uma vez que ele foi criado e alguma coisa foi postada e tal
 image e video url são opcionais, pois o usuário pode apenas postar um texto, que está em content.
-user_id é uma foreign key que vai referenciar o id do User que fez o post
+elas são preenchidas pelo POST /posts/{post_id}/media (ver media.py).
+user_id é uma foreign key que vai referenciar o id do User que fez o post, com índice para listar os posts de um usuário
 created_at é a data de criação do post, que vai ser preenchida automaticamente com a data atual
 updated_at é a data de atualização do post, que vai ser preenchida automaticamente com a data atual, caso o post seja atualizado (nao consegui implementar ainda)
+likes_count e dislikes_count são contadores desnormalizados, atualizados pelo toggle_like na mesma transação
+do like, assim as rotas de leitura não precisam contar a tabela Like (ver reconcile.py para recalcular)
+hot_score é o score com decaimento no tempo usado pelo feed ?sort=hot (ver ranking.py)
 '''
 class Post(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     content: str 
-#   image_url: Optional[str] = None
-#    video_url: Optional[str] = None
-    user_id: int = Field(foreign_key="user.id")
+    image_url: Optional[str] = None
+    video_url: Optional[str] = None
+    user_id: int = Field(foreign_key="user.id", index=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = None
+    likes_count: int = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"})
+    dislikes_count: int = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"})
+    hot_score: float = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"})
+
+    # Índice do feed (ordenado por created_at, id); os índices são criados pelas migrações (migrations.py)
+    __table_args__ = (
+        Index("ix_post_created_at_id", "created_at", "id"),
+    )
 
 # PostCreate vai ser usada para criar um novo post
+# o autor é o usuário do token (ver auth.get_current_user_id)
 class PostCreate(SQLModel):  
     #image_url: Optional[str] = None
     #video_url: Optional[str] = None
     content: str  
-    user_id: int
 
 
 #---------------------------------------------------------------------------------------------
 
+# Faixa do INTEGER do SQLite; fora dela o bind do parâmetro dá OverflowError (500)
+SQLITE_MIN_INT = -2**63
+SQLITE_MAX_INT = 2**63 - 1
+
 class LikeType(str, enum.Enum):  
     LIKE = "like"  
     DISLIKE = "dislike"  
@@ -79,16 +112,56 @@ class Like(SQLModel, table=True):
     # Garante que um usuário só pode ter uma interação por post  
     __table_args__ = (  
         UniqueConstraint('user_id', 'post_id', name='unique_user_post_like'),  
+        # contagem de likes/dislikes de um post sem ler a tabela (ver reconcile.py)
+        Index('ix_like_post_id_type', 'post_id', 'type'),
     )  
 
 class LikeCreate(SQLModel):  
-    post_id: int  
+    post_id: int = Field(ge=1, le=SQLITE_MAX_INT)
     type: LikeType  
 
+# LikeBatch vai ser usada para aplicar várias reações de uma vez (POST /likes/batch)
+class LikeBatch(SQLModel):
+    reactions: List[LikeCreate]
+
 class PostWithLikes(SQLModel):  
     id: int  
     content: str  
     user_id: int  
+    created_at: Optional[datetime] = None
     likes_count: int = 0  
     dislikes_count: int = 0  
-    user_like_type: Optional[LikeType] = None
\ No newline at end of file
+    user_like_type: Optional[LikeType] = None
+
+# Resposta do POST /posts/{post_id}/media
+class MediaInfo(SQLModel):
+    url: str
+    sha256: str
+    size: int
+    content_type: str
+    deduplicated: bool
+    variants: Dict[str, str] = {}
+
+class PostWithMedia(SQLModel):
+    post: Post
+    media: MediaInfo
+
+# Resultado da busca em /posts/search, com o trecho do conteúdo destacado
+class PostSearchResult(SQLModel):
+    id: int
+    content: str
+    user_id: int
+    created_at: datetime
+    snippet: str
+
+# CacheInvalidation é o log de mudanças compartilhado entre os workers (ver coherence.py)
+'''
+kind diz o que mudou (post_created, post_updated, post_deleted, reaction, session, ranking);
+post_id, user_id e token_hash dizem qual entrada dos caches apagar.
+'''
+class CacheInvalidation(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str
+    post_id: Optional[int] = None
+    user_id: Optional[int] = None
+    token_hash: Optional[str] = None
@@ -0,0 +1,104 @@
+from datetime import datetime
+from sqlalchemy.engine import Connection
+from sqlmodel import select
+from typing import List
+from .models import LikeType, Post, User
+from .routers.posts import FeedSort, _encode_cursor, feed_statement, posts_statement, reactions_statement, stream_chunk_statement
+from .routers.likes import (
+    counters_update, current_reactions_delete, existing_posts_statement, summaries_statement,
+)
+from .reconcile import _count_of
+from .auth import expired_sessions_statement, session_statement
+from .search import search_statement
+import sys
+'''
+Verificação de regressão dos planos de consulta: roda EXPLAIN QUERY PLAN nas queries
+das rotas (montadas pelas mesmas funções que os routers usam) e falha se alguma
+faz SCAN da tabela inteira em vez de usar um índice.
+
+Uso (dentro da pasta backend); as migrações pendentes são aplicadas antes:
+    python -m app.query_plans
+Sai com código 1 se alguma query da lista faz full scan (bom para rodar no CI).
+
+GET /posts/ sem stream devolve a tabela toda, então o SCAN dele é esperado e não entra na lista.
+'''
+
+
+def router_queries():
+    # (nome, statement); os valores dos parâmetros não importam para o plano
+    now = datetime.utcnow()
+    queries = [
+        ("GET /posts/?stream", stream_chunk_statement(0)),
+        ("GET /posts/user/{id}", posts_statement(Post.user_id == 1)),
+        ("GET /posts/user/{id}?stream", stream_chunk_statement(0, Post.user_id == 1)),
+        ("GET /posts/{id}", select(Post).where(Post.id == 1)),
+        ("GET /posts/feed reações", reactions_statement(1, [1, 2, 3])),
+        ("GET /posts/search", search_statement("teste", 20)),
+        ("GET /posts/search?cursor", search_statement("teste", 20, (-1.0, 10))),
+        ("POST /likes reações atuais", current_reactions_delete(1, [1, 2, 3])),
+        ("POST /likes posts existentes", existing_posts_statement([1, 2, 3])),
+        ("POST /likes contadores", counters_update()),
+        ("GET /likes/summary", summaries_statement([1, 2, 3])),
+        ("GET /likes/post/{id}", summaries_statement([1])),
+        ("POST /users/login", select(User).where(User.username == "usuario")),
+        ("POST /users/login sessões expiradas", expired_sessions_statement(1)),
+        ("sessão do token (sem cache)", session_statement("token")),
+        ("reconcile contagem", select(Post.id, _count_of(LikeType.LIKE)).where(Post.id == 1)),
+    ]
+    cursors = {FeedSort.NEW: now, FeedSort.TOP: 10, FeedSort.HOT: 1.5}
+    for sort in FeedSort:
+        queries.append((f"GET /posts/feed?sort={sort.value}", feed_statement(20, None, sort)))
+        cursor = _encode_cursor(cursors[sort], 10)
+        queries.append((f"GET /posts/feed?sort={sort.value}&cursor", feed_statement(20, cursor, sort)))
+    return queries
+
+
+def explain(connection: Connection, statement) -> List[str]:
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={"render_postcompile": True})
+    parameters = tuple(None for _ in compiled.positiontup or ())
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled.string}", parameters).all()
+    return [row[3] for row in rows]
+
+
+def is_full_scan(detail: str) -> bool:
+    # "SCAN post" lê a tabela inteira; "SCAN post USING INDEX ..." percorre um índice em ordem
+    # e "SCAN post_fts VIRTUAL TABLE INDEX ..." é a busca do FTS5
+    return detail.startswith("SCAN ") and " USING " not in detail and " VIRTUAL TABLE " not in detail
+
+
+def check_query_plans(connection: Connection):
+    # Devolve [(nome, plano, tem full scan)]
+    results = []
+    for name, statement in router_queries():
+        plan = explain(connection, statement)
+        results.append((name, plan, any(is_full_scan(detail) for detail in plan)))
+    return results
+
+
+def main(argv=None):
+    import argparse
+    from .db import engine
+    from .migrations import migrate
+
+    parser = argparse.ArgumentParser(description="Verifica se as queries das rotas usam índices.")
+    parser.add_argument("--verbose", action="store_true", help="mostra o plano de todas as queries")
+    args = parser.parse_args(argv)
+
+    migrate(engine)
+    with engine.connect() as connection:
+        results = check_query_plans(connection)
+
+    failures = 0
+    for name, plan, full_scan in results:
+        if full_scan:
+            failures += 1
+        if full_scan or args.verbose:
+            print(f"{'FULL SCAN' if full_scan else 'ok':<10}{name}")
+            for detail in plan:
+                print(f"{'':<12}{detail}")
+    print(f"{len(results) - failures}/{len(results)} queries usam índice.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+from datetime import datetime
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from typing import Optional
+import asyncio
+import logging
+import os
+'''
+Ranking do feed (GET /posts/feed?sort=top|hot).
+
+top: likes_count - dislikes_count, com um índice de expressão (ix_post_net_votes).
+hot: a coluna Post.hot_score, com índice (ix_post_hot_score), calculada como
+    (likes - dislikes) / (idade em horas + 2) ^ HOT_GRAVITY
+A função decayed_score é registrada em cada conexão SQLite (ver db.py), então o
+counters_update do toggle_like recalcula o hot_score do post no mesmo UPDATE dos contadores.
+Como a idade dos posts muda sem ninguém reagir, o hot_score_refresher recalcula os
+scores a cada HOT_REFRESH_SECONDS, em blocos de HOT_REFRESH_CHUNK posts por transação.
+Com os índices, uma página ordenada é uma leitura de faixa do índice, sem agregar a tabela Like.
+
+Uso (dentro da pasta backend):
+    python -m app.ranking --refresh    recalcula todos os hot_score agora
+'''
+
+HOT_GRAVITY = float(os.getenv("HOT_GRAVITY", "1.8"))
+HOT_REFRESH_SECONDS = float(os.getenv("HOT_REFRESH_SECONDS", "300"))
+HOT_REFRESH_CHUNK = 5000
+
+RANKING_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ix_post_hot_score ON post (hot_score)",
+    "CREATE INDEX IF NOT EXISTS ix_post_net_votes ON post ((likes_count - dislikes_count))",
+)
+
+logger = logging.getLogger("app.ranking")
+
+
+def decayed_score(likes: int, dislikes: int, created_at, now: Optional[datetime] = None) -> float:
+    # created_at chega do SQLite como texto ("2025-05-01 12:00:00.000000")
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at)
+    now = now or datetime.utcnow()
+    age_hours = max((now - created_at).total_seconds() / 3600, 0.0)
+    return (likes - dislikes) / (age_hours + 2) ** HOT_GRAVITY
+
+
+def register_functions(dbapi_connection):
+    dbapi_connection.create_function("decayed_score", 3, decayed_score)
+
+
+def _refresh_statement():
+    # Posts com saldo zero têm score 0 em qualquer idade, não precisam ser reescritos
+    return text(
+        "UPDATE post SET hot_score = decayed_score(likes_count, dislikes_count, created_at) "
+        "WHERE id > :first_id AND id <= :last_id AND likes_count != dislikes_count"
+    )
+
+
+def ensure_ranking_columns(connection: Connection):
+    # Bancos antigos não têm hot_score; os índices são criados nos dois casos
+    columns = {column["name"] for column in inspect(connection).get_columns("post")}
+    if "hot_score" not in columns:
+        connection.execute(text("ALTER TABLE post ADD COLUMN hot_score FLOAT NOT NULL DEFAULT 0"))
+        connection.execute(_refresh_statement(), {"first_id": 0, "last_id": 2 ** 63 - 1})
+    for statement in RANKING_INDEXES:
+        connection.execute(text(statement))
+
+
+def refresh_hot_scores(engine: Engine) -> int:
+    # Um bloco por transação, para não segurar o lock de escrita do SQLite por muito tempo
+    with engine.connect() as connection:
+        last_id = connection.execute(text("SELECT max(id) FROM post")).scalar() or 0
+    updated = 0
+    for first_id in range(0, last_id, HOT_REFRESH_CHUNK):
+        with engine.begin() as connection:
+            result = connection.execute(
+                _refresh_statement(), {"first_id": first_id, "last_id": first_id + HOT_REFRESH_CHUNK}
+            )
+            updated += result.rowcount
+    return updated
+
+
+async def hot_score_refresher(engine: Engine):
+    # Tarefa de fundo iniciada no lifespan do main.py
+    from . import cache
+
+    while True:
+        await asyncio.sleep(HOT_REFRESH_SECONDS)
+        try:
+            updated = await asyncio.to_thread(refresh_hot_scores, engine)
+            cache.on_scores_refreshed()
+            logger.info("hot_score recalculado em %d posts", updated)
+        except Exception:
+            logger.exception("falha ao recalcular o hot_score")
+
+
+def main(argv=None):
+    import argparse
+    from .db import engine
+
+    parser = argparse.ArgumentParser(description="Recalcula o hot_score dos posts.")
+    parser.add_argument("--refresh", action="store_true", help="recalcula todos os scores")
+    args = parser.parse_args(argv)
+    if not args.refresh:
+        parser.print_help()
+        return 0
+
+    from .migrations import migrate
+    migrate(engine)
+    print(f"hot_score recalculado em {refresh_hot_scores(engine)} posts.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
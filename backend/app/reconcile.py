@@ -0,0 +1,94 @@
+from sqlalchemy import func, inspect, select, text, update
+from sqlalchemy.engine import Connection
+from .models import Like, LikeType, Post
+from .db import engine
+'''
+Recalcula os contadores desnormalizados likes_count/dislikes_count da tabela Post
+a partir da tabela Like e mostra os posts em que o contador estava errado (drift).
+
+Uso (dentro da pasta backend):
+    python -m app.reconcile           recalcula e corrige
+    python -m app.reconcile --check   só mostra o drift, sem alterar nada
+'''
+
+
+def ensure_counter_columns(connection: Connection):
+    # Bancos antigos (rede.db) não têm as colunas de contador, o create_all não altera tabelas existentes
+    columns = {column["name"] for column in inspect(connection).get_columns("post")}
+    for name in ("likes_count", "dislikes_count"):
+        if name not in columns:
+            connection.execute(text(f"ALTER TABLE post ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0"))
+
+
+def _actual_counts():
+    # Contagem real de likes/dislikes por post, numa única query agrupada
+    return (
+        select(
+            Like.post_id.label("post_id"),
+            func.count().filter(Like.type == LikeType.LIKE).label("likes"),
+            func.count().filter(Like.type == LikeType.DISLIKE).label("dislikes"),
+        )
+        .group_by(Like.post_id)
+        .subquery()
+    )
+
+
+def _count_of(like_type: LikeType):
+    return (
+        select(func.count())
+        .where(Like.post_id == Post.id, Like.type == like_type)
+        .scalar_subquery()
+    )
+
+
+def find_drift(connection: Connection):
+    actual = _actual_counts()
+    likes = func.coalesce(actual.c.likes, 0)
+    dislikes = func.coalesce(actual.c.dislikes, 0)
+    statement = (
+        select(Post.id, Post.likes_count, likes, Post.dislikes_count, dislikes)
+        .outerjoin(actual, actual.c.post_id == Post.id)
+        .where((Post.likes_count != likes) | (Post.dislikes_count != dislikes))
+        .order_by(Post.id)
+    )
+    return connection.execute(statement).all()
+
+
+def reconcile_counters(connection: Connection, fix: bool = True):
+    drift = find_drift(connection)
+    if fix and drift:
+        # Recalcula com subqueries correlacionadas, atualizando só as linhas com drift
+        likes = _count_of(LikeType.LIKE)
+        dislikes = _count_of(LikeType.DISLIKE)
+        connection.execute(
+            update(Post)
+            .where((Post.likes_count != likes) | (Post.dislikes_count != dislikes))
+            .values(likes_count=likes, dislikes_count=dislikes, hot_score=func.decayed_score(likes, dislikes, Post.created_at))
+        )
+    return drift
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Recalcula os contadores de likes/dislikes dos posts.")
+    parser.add_argument("--check", action="store_true", help="apenas mostra o drift, sem corrigir")
+    args = parser.parse_args(argv)
+
+    from .migrations import migrate
+    migrate(engine)
+    with engine.begin() as connection:
+        drift = reconcile_counters(connection, fix=not args.check)
+
+    for post_id, likes_stored, likes_actual, dislikes_stored, dislikes_actual in drift:
+        print(
+            f"post {post_id}: likes {likes_stored} -> {likes_actual}, "
+            f"dislikes {dislikes_stored} -> {dislikes_actual}"
+        )
+    action = "encontrados" if args.check else "corrigidos"
+    print(f"{len(drift)} posts com contadores divergentes {action}.")
+    return 1 if args.check and drift else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
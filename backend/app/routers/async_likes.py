@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, Path, Query, Request
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Annotated, List, Optional
+from ..models import SQLITE_MAX_INT, LikeBatch, LikeCreate, PostWithLikes
+from ..async_db import get_async_read_session, get_async_session
+from .. import auth, cache
+from .likes import batch_response, parse_post_ids, summaries_response, summary_response, toggle_response
+'''
+Versão async das rotas de likes (ASYNC_DB=1): as funções do likes.py rodam pelo
+AsyncSession.run_sync (ver async_posts.py).
+'''
+router = APIRouter(prefix="/likes")
+
+
+@router.post("/batch")
+async def toggle_likes_batch(
+    batch: LikeBatch,
+    user_id: int = Depends(auth.get_current_user_id),
+    session: AsyncSession = Depends(get_async_session)
+):
+    return await session.run_sync(batch_response, user_id, batch)
+
+
+@router.post("/{post_id:int}")
+async def toggle_like(
+    post_id: Annotated[int, Path(ge=1, le=SQLITE_MAX_INT)],
+    like_data: LikeCreate,
+    user_id: int = Depends(auth.get_current_user_id),
+    session: AsyncSession = Depends(get_async_session)
+):
+    return await session.run_sync(toggle_response, user_id, post_id, like_data.type)
+
+@router.get("/post/{post_id:int}", response_model=PostWithLikes)
+async def get_post_with_likes(
+    post_id: int,
+    request: Request,
+    user_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    version = await cache.current_version_async()
+    return await session.run_sync(summary_response, request, version, post_id, user_id)
+
+
+@router.get("/summary", response_model=List[PostWithLikes])
+async def get_posts_summary(
+    request: Request,
+    post_ids: str = Query(..., description="Ids dos posts separados por vírgula, ex: 1,2,3"),
+    user_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    ids = parse_post_ids(post_ids)
+    version = await cache.current_version_async()
+    return await session.run_sync(summaries_response, request, version, ids, user_id)
@@ -0,0 +1,102 @@
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Optional
+from ..models import Post, PostWithLikes, PostCreate
+from ..async_db import async_read_engine, get_async_read_session, get_async_session
+from .. import auth, cache
+from .posts import (
+    FEED_DEFAULT_LIMIT, FEED_MAX_LIMIT, NDJSON_MEDIA_TYPE, FeedSort,
+    add_post, change_post, feed_response, load_post, posts_response, remove_post, stream_chunk_statement,
+    stream_lines, wants_stream,
+)
+'''
+Versão async das rotas de posts (ASYNC_DB=1).
+A lógica é a do posts.py: as mesmas funções rodam pelo AsyncSession.run_sync, que as executa
+com a sessão sync por cima da conexão do aiosqlite, sem ocupar uma thread do threadpool.
+Aqui ficam só a sessão async, os awaits e o gerador do streaming.
+Os caminhos usam {post_id:int} para não capturar rotas que só existem na versão sync.
+'''
+router = APIRouter(prefix="/posts")
+
+# Criar post
+@router.post("/", response_model=Post)
+async def create_post(
+    post: PostCreate,
+    user_id: int = Depends(auth.get_current_user_id),
+    session: AsyncSession = Depends(get_async_session)
+):
+    return await session.run_sync(add_post, post.content, user_id)
+
+
+async def _stream_posts(*criteria):
+    last_id = 0
+    while True:
+        async with AsyncSession(async_read_engine) as session:
+            chunk = (await session.exec(stream_chunk_statement(last_id, *criteria))).all()
+            lines = stream_lines(chunk)
+        if not chunk:
+            break
+        yield lines
+        last_id = chunk[-1].id
+
+
+# Listar todos os posts
+@router.get("/", response_model=List[Post])
+async def list_posts(
+    request: Request,
+    stream: bool = Query(False, description="Envia os posts como NDJSON"),
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    if wants_stream(request, stream):
+        return StreamingResponse(_stream_posts(), media_type=NDJSON_MEDIA_TYPE)
+    return await session.run_sync(posts_response, request)
+
+# Listar posts de um usuário
+@router.get("/user/{user_id:int}", response_model=List[Post])
+async def list_user_posts(
+    user_id: int,
+    request: Request,
+    stream: bool = Query(False, description="Envia os posts como NDJSON"),
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    if wants_stream(request, stream):
+        return StreamingResponse(_stream_posts(Post.user_id == user_id), media_type=NDJSON_MEDIA_TYPE)
+    return await session.run_sync(posts_response, request, Post.user_id == user_id)
+
+# FEED: Listar posts com contagem de likes/dislikes
+@router.get("/feed", response_model=List[PostWithLikes])
+async def list_posts_with_likes(
+    request: Request,
+    session: AsyncSession = Depends(get_async_read_session),
+    user_id: Optional[int] = Query(None, description="ID do usuário logado (opcional)"),
+    limit: int = Query(FEED_DEFAULT_LIMIT, ge=1, le=FEED_MAX_LIMIT, description="Quantidade de posts por página"),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (header X-Next-Cursor)"),
+    sort: FeedSort = Query(FeedSort.NEW, description="new (mais recentes), top (saldo de likes) ou hot (saldo com decaimento)")
+):
+    version = await cache.current_version_async()
+    return await session.run_sync(feed_response, request, version, user_id, limit, cursor, sort)
+
+# Buscar post por ID
+@router.get("/{post_id:int}", response_model=Post)
+async def get_post(post_id: int, session: AsyncSession = Depends(get_async_read_session)):
+    return await session.run_sync(load_post, post_id)
+
+# Atualizar post
+@router.put("/{post_id:int}", response_model=Post)
+async def update_post(
+    post_id: int,
+    post_data: PostCreate,
+    user_id: int = Depends(auth.get_current_user_id),
+    session: AsyncSession = Depends(get_async_session)
+):
+    return await session.run_sync(change_post, post_id, user_id, post_data.content)
+
+# Deletar post
+@router.delete("/{post_id:int}")
+async def delete_post(
+    post_id: int,
+    user_id: int = Depends(auth.get_current_user_id),
+    session: AsyncSession = Depends(get_async_session)
+):
+    return await session.run_sync(remove_post, post_id, user_id)
@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Optional
+from ..models import UserCreate, UserLogin, UserPublic
+from ..async_db import get_async_read_session, get_async_session
+from .. import auth
+from .users import add_user, check_password, check_username_free, end_session, find_user, load_user, start_session
+import asyncio
+'''
+Versão async das rotas de usuários (ASYNC_DB=1): as funções do users.py rodam pelo
+AsyncSession.run_sync (ver async_posts.py).
+O hash da senha roda no asyncio.to_thread para não travar o event loop.
+'''
+router = APIRouter(prefix="/users")
+
+@router.post("/register", response_model=UserPublic)
+async def register_user(user: UserCreate, session: AsyncSession = Depends(get_async_session)):
+    await session.run_sync(check_username_free, user.username)
+    password = await asyncio.to_thread(auth.hash_password, user.password)
+    return await session.run_sync(add_user, user.username, password)
+
+
+@router.post("/login")
+async def login(
+    data: UserLogin,
+    session: AsyncSession = Depends(get_async_session)
+):
+    user = await session.run_sync(find_user, data.username)
+    new_password_hash = await asyncio.to_thread(check_password, user, data.password)
+    return await session.run_sync(start_session, user, new_password_hash)
+
+
+@router.post("/logout")
+async def logout(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(auth.bearer_scheme),
+    session: AsyncSession = Depends(get_async_session)
+):
+    return await session.run_sync(end_session, credentials)
+
+
+@router.get("/me", response_model=UserPublic)
+async def current_user(
+    user_id: int = Depends(auth.get_current_user_id),
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    return await session.run_sync(load_user, user_id)
@@ -1,97 +1,262 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Path, Query, Request, Response
 from sqlmodel import Session, select
-from typing import Optional
-from ..models import Like, LikeCreate, LikeType, Post, PostWithLikes
-from ..db import get_session
-from sqlalchemy import func
+from typing import Annotated, Dict, List, Optional, Tuple
+from datetime import datetime
+from ..models import SQLITE_MAX_INT, Like, LikeBatch, LikeCreate, LikeType, Post, PostWithLikes
+from ..db import get_read_session, get_session
+from .. import auth, cache, events, serialization
+from .posts import with_user_reactions
+from sqlalchemy import bindparam, delete, func, insert, update
 
 router = APIRouter(prefix="/likes")
 
+'''
+O toggle (POST /likes/{post_id}) e o lote (POST /likes/batch) passam pelo mesmo caminho,
+com um número fixo de statements por lote, qualquer que seja o tamanho dele:
+1. DELETE ... RETURNING das reações atuais do usuário nos posts do lote: devolve como
+   estavam e já pega o lock de escrita, então nada muda entre esta leitura e o fim
+2. SELECT dos posts do lote que existem
+3. as reações são aplicadas em ordem, em memória (toggle_outcome): mesmo tipo remove,
+   outro tipo troca, sem reação adiciona; o resultado não depende do relógio, então duas
+   reações no mesmo post no mesmo instante contam certo
+4. INSERT (executemany) do estado final; uma reação que já existia volta com o mesmo id e
+   created_at, como num UPDATE
+5. UPDATE (executemany) dos contadores de cada post com os deltas somados do lote
+   (e do hot_score, ver ranking.py)
+Tudo na mesma transação do commit.
+'''
+LIKE_BATCH_MAX = 500
+SUMMARY_MAX_IDS = 300
+
+
+def current_reactions_delete(user_id: int, post_ids: List[int]):
+    likes = Like.__table__
+    return (
+        delete(likes)
+        .where(likes.c.user_id == user_id, likes.c.post_id.in_(post_ids))
+        .returning(likes.c.id, likes.c.post_id, likes.c.type, likes.c.created_at)
+    )
+
+
+def existing_posts_statement(post_ids: List[int]):
+    return select(Post.id).where(Post.id.in_(post_ids))
+
+
+def reactions_insert():
+    # executemany com {"id", "user_id", "post_id", "type", "created_at"}; id None = reação nova
+    return insert(Like.__table__)
+
+
+def counters_update():
+    # Atualiza os contadores direto no banco (col = col + delta), sem ler o post antes,
+    # e o hot_score junto (no SET as colunas ainda têm o valor antigo, por isso o + delta);
+    # executemany com {"post": id, "likes_delta": ..., "dislikes_delta": ...}
+    post = Post.__table__.c
+    likes = post.likes_count + bindparam("likes_delta")
+    dislikes = post.dislikes_count + bindparam("dislikes_delta")
+    return (
+        update(Post.__table__)
+        .where(post.id == bindparam("post"))
+        .values(
+            likes_count=likes,
+            dislikes_count=dislikes,
+            hot_score=func.decayed_score(likes, dislikes, post.created_at)
+        )
+    )
+
+
+def toggle_outcome(like_type: LikeType, action: Optional[str]):
+    # Devolve a ação feita e os deltas de (likes, dislikes); ação None = post não existe
+    sign = {LikeType.LIKE: (1, 0), LikeType.DISLIKE: (0, 1)}[like_type]
+    if action == "removed":
+        return action, -sign[0], -sign[1]
+    if action == "added":
+        return action, sign[0], sign[1]
+    if action == "switched":
+        # +1 no novo, -1 no outro
+        return action, sign[0] - sign[1], sign[1] - sign[0]
+    return None, 0, 0
+
+
+def toggle_action(current: Optional[LikeType], like_type: LikeType) -> str:
+    if current == like_type:
+        return "removed"
+    return "switched" if current is not None else "added"
+
+
+TOGGLE_MESSAGES = {
+    "removed": "Like removido",
+    "switched": "Alterado para {type}",
+    "added": "{type} adicionado",
+}
+
+
+def toggle_reactions(session: Session, user_id: int, reactions: List[Tuple[int, LikeType]]) -> List[Optional[str]]:
+    # Aplica as reações (post_id, tipo) em ordem, numa transação só, e devolve a ação de cada uma
+    post_ids = list(dict.fromkeys(post_id for post_id, _ in reactions))
+    previous = {row.post_id: row for row in session.exec(current_reactions_delete(user_id, post_ids)).all()}
+    existing = set(session.exec(existing_posts_statement(post_ids)).all())
+
+    state = {post_id: row.type for post_id, row in previous.items()}
+    actions = []
+    deltas = {}
+    for post_id, like_type in reactions:
+        if post_id not in existing:
+            actions.append(None)
+            continue
+        action, likes_delta, dislikes_delta = toggle_outcome(like_type, toggle_action(state.get(post_id), like_type))
+        state[post_id] = None if action == "removed" else like_type
+        actions.append(action)
+        total = deltas.setdefault(post_id, [0, 0])
+        total[0] += likes_delta
+        total[1] += dislikes_delta
+
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": previous[post_id].id if post_id in previous else None,
+            "user_id": user_id,
+            "post_id": post_id,
+            "type": like_type,
+            "created_at": previous[post_id].created_at if post_id in previous else now,
+        }
+        for post_id, like_type in state.items() if like_type is not None
+    ]
+    if rows:
+        session.exec(reactions_insert(), params=rows)
+    # Os contadores do post são atualizados no mesmo commit dos likes
+    if deltas:
+        session.exec(counters_update(), params=[
+            {"post": post_id, "likes_delta": likes_delta, "dislikes_delta": dislikes_delta}
+            for post_id, (likes_delta, dislikes_delta) in deltas.items()
+        ])
+    session.commit()
+
+    for post_id in deltas:
+        cache.on_reaction_changed(post_id, user_id)
+        events.bus.publish_reaction(post_id)
+    return actions
+
+
+def batch_response(session: Session, user_id: int, batch: LikeBatch) -> dict:
+    # Aplica várias reações do mesmo usuário em uma transação só (fila de reações do cliente)
+    if len(batch.reactions) > LIKE_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"Máximo de {LIKE_BATCH_MAX} reações por lote.")
+    actions = toggle_reactions(session, user_id, [(reaction.post_id, reaction.type) for reaction in batch.reactions])
+    return {"results": [
+        {"post_id": reaction.post_id, "type": reaction.type, "action": action or "not_found"}
+        for reaction, action in zip(batch.reactions, actions)
+    ]}
+
+
+def toggle_response(session: Session, user_id: int, post_id: int, like_type: LikeType) -> dict:
+    action, = toggle_reactions(session, user_id, [(post_id, like_type)])
+    if action is None:
+        raise HTTPException(status_code=404, detail="Post não encontrado")
+    return {"message": TOGGLE_MESSAGES[action].format(type=like_type)}
+
+
+@router.post("/batch")
+def toggle_likes_batch(
+    batch: LikeBatch,
+    user_id: int = Depends(auth.get_current_user_id),
+    session: Session = Depends(get_session)
+):
+    return batch_response(session, user_id, batch)
+
+
 @router.post("/{post_id}")
 def toggle_like(
-    post_id: int,
+    post_id: Annotated[int, Path(ge=1, le=SQLITE_MAX_INT)],
     like_data: LikeCreate,
-    user_id: int,  # Você pode pegar isso do token de autenticação
+    user_id: int = Depends(auth.get_current_user_id),
     session: Session = Depends(get_session)
 ):
-    # Verifica se o post existe
-    post = session.get(Post, post_id)
-    if not post:
+    return toggle_response(session, user_id, post_id, like_data.type)
+
+def summaries_statement(post_ids):
+    # Colunas do PostWithLikes (ver serialization.summary_dict)
+    return select(*serialization.SUMMARY_COLUMNS).where(Post.id.in_(post_ids))
+
+
+def parse_post_ids(post_ids: str) -> List[int]:
+    # "1,2,3" -> [1, 2, 3], sem repetidos e mantendo a ordem
+    try:
+        ids = list(dict.fromkeys(int(value) for value in post_ids.split(",") if value.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="post_ids deve ser uma lista de ids separados por vírgula.")
+    if not ids:
+        raise HTTPException(status_code=400, detail="Informe pelo menos um post_id.")
+    if any(not 1 <= post_id <= SQLITE_MAX_INT for post_id in ids):
+        # fora do INTEGER do SQLite o bind do parâmetro dá OverflowError (500)
+        raise HTTPException(status_code=400, detail=f"Os post_ids devem estar entre 1 e {SQLITE_MAX_INT}.")
+    if len(ids) > SUMMARY_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {SUMMARY_MAX_IDS} posts por consulta.")
+    return ids
+
+
+def load_summaries(session: Session, ids: List[int], version: int) -> Dict[int, dict]:
+    # Resumos do cache; os que faltam vêm de uma query IN só
+    summaries = {}
+    for post_id in ids:
+        summary = cache.feed_cache.get(("summary", post_id))
+        if summary is not cache.MISSING:
+            summaries[post_id] = summary
+    missing = [post_id for post_id in ids if post_id not in summaries]
+    if missing:
+        for row in session.exec(summaries_statement(missing)).all():
+            summaries[row.id] = serialization.summary_dict(row)
+            cache.feed_cache.set(("summary", row.id), summaries[row.id], version)
+    return summaries
+
+
+def summary_response(session: Session, request: Request, version: int, post_id: int, user_id: Optional[int]) -> Response:
+    etag = cache.make_etag(version, "summary", post_id, user_id, serialization.negotiated_type(request))
+    if cache.etag_matches(request, etag):
+        return cache.not_modified(etag)
+
+    # As contagens vêm dos contadores do próprio post (resumo guardado no cache)
+    summary = load_summaries(session, [post_id], version).get(post_id)
+    if summary is None:
         raise HTTPException(status_code=404, detail="Post não encontrado")
+    # Se user_id foi fornecido, aplica o tipo de like do usuário
+    summary, = with_user_reactions(session, [summary], user_id, version)
 
-    # Busca se já existe um like deste usuário neste post
-    existing_like = session.exec(
-        select(Like).where(
-            Like.user_id == user_id,
-            Like.post_id == post_id
-        )
-    ).first()
-
-    if existing_like:
-        if existing_like.type == like_data.type:
-            # Se o usuário está dando o mesmo tipo de like, remove
-            session.delete(existing_like)
-            session.commit()
-            return {"message": "Like removido"}
-        else:
-            # Se está mudando o tipo (de like para dislike ou vice-versa)
-            existing_like.type = like_data.type
-            session.add(existing_like)
-            session.commit()
-            return {"message": f"Alterado para {like_data.type}"}
-    else:
-        # Se não existe like, cria um novo
-        new_like = Like(
-            user_id=user_id,
-            post_id=post_id,
-            type=like_data.type
-        )
-        session.add(new_like)
-        session.commit()
-        return {"message": f"{like_data.type} adicionado"}
+    response = serialization.render(request, summary)
+    cache.set_etag(response, etag)
+    return response
+
+
+def summaries_response(session: Session, request: Request, version: int, ids: List[int], user_id: Optional[int]) -> Response:
+    etag = cache.make_etag(version, "summaries", tuple(ids), user_id, serialization.negotiated_type(request))
+    if cache.etag_matches(request, etag):
+        return cache.not_modified(etag)
+
+    summaries = load_summaries(session, ids, version)
+    # Posts que não existem ficam de fora da resposta
+    posts = [summaries[post_id] for post_id in ids if post_id in summaries]
+    response = serialization.render(request, with_user_reactions(session, posts, user_id, version))
+    cache.set_etag(response, etag)
+    return response
 
-@router.get("/post/{post_id}")
+
+@router.get("/post/{post_id}", response_model=PostWithLikes)
 def get_post_with_likes(
     post_id: int,
+    request: Request,
     user_id: Optional[int] = None,  # Opcional, para ver o like do usuário atual
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ):
-    post = session.get(Post, post_id)
-    if not post:
-        raise HTTPException(status_code=404, detail="Post não encontrado")
+    return summary_response(session, request, cache.current_version(), post_id, user_id)
 
-    # Conta likes e dislikes
-    likes_count = session.exec(
-        select(func.count(Like.id)).where(
-            Like.post_id == post_id,
-            Like.type == LikeType.LIKE
-        )
-    ).first()
 
-    dislikes_count = session.exec(
-        select(func.count(Like.id)).where(
-            Like.post_id == post_id,
-            Like.type == LikeType.DISLIKE
-        )
-    ).first()
-
-    # Se user_id foi fornecido, busca o tipo de like do usuário
-    user_like_type = None
-    if user_id:
-        user_like = session.exec(
-            select(Like).where(
-                Like.post_id == post_id,
-                Like.user_id == user_id
-            )
-        ).first()
-        if user_like:
-            user_like_type = user_like.type
-
-    return PostWithLikes(
-        id=post.id,
-        content=post.content,
-        user_id=post.user_id,
-        likes_count=likes_count,
-        dislikes_count=dislikes_count,
-        user_like_type=user_like_type
-    )
\ No newline at end of file
+# Resumo de vários posts de uma vez: uma query IN para os posts que não estão no cache
+# e uma query para as reações do usuário
+@router.get("/summary", response_model=List[PostWithLikes])
+def get_posts_summary(
+    request: Request,
+    post_ids: str = Query(..., description="Ids dos posts separados por vírgula, ex: 1,2,3"),
+    user_id: Optional[int] = None,
+    session: Session = Depends(get_read_session)
+):
+    return summaries_response(session, request, cache.current_version(), parse_post_ids(post_ids), user_id)
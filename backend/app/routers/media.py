@@ -0,0 +1,208 @@
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from fastapi.responses import FileResponse
+from python_multipart.multipart import MultipartParser, parse_options_header
+from python_multipart.exceptions import MultipartParseError
+from sqlmodel import Session
+from typing import Iterable, Iterator, Tuple
+from ..models import Post, PostWithMedia, MediaInfo
+from ..db import get_session
+from .. import auth, cache, events, media
+import anyio.from_thread
+import os
+'''
+Upload e download das mídias dos posts (ver media.py).
+
+O upload chega como multipart (campo `file`), mas a rota não usa UploadFile: com ele o
+Starlette lê o corpo inteiro para um arquivo temporário antes de a rota rodar (antes até da
+autenticação), e o arquivo era gravado duas vezes. Aqui:
+1. um Content-Length maior que o limite já recebe 413, sem ler nada (check_upload_size);
+2. o token e o dono do post são conferidos antes de ler o corpo;
+3. o corpo é lido em blocos do request.stream() e passa por um parser multipart incremental
+   (python-multipart, o mesmo que o Starlette usa); só os bytes do campo `file` vão para o
+   MediaWriter, que calcula o hash e para em MEDIA_MAX_BYTES enquanto grava.
+A rota é sync (roda no threadpool, como as outras); cada bloco do corpo vem do event loop
+pelo anyio.from_thread, e a gravação no disco fica fora do event loop.
+'''
+router = APIRouter()
+
+UPLOAD_FIELD = "file"
+# Folga para os boundaries e cabeçalhos do multipart em volta do arquivo
+MULTIPART_OVERHEAD = 64 * 1024
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": [UPLOAD_FIELD],
+            "properties": {UPLOAD_FIELD: {"type": "string", "format": "binary"}},
+        }}},
+    }
+}
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Arquivo maior que {media.MEDIA_MAX_BYTES // (1024 * 1024)} MB.")
+
+
+def check_upload_size(request: Request):
+    # Roda antes da autenticação e de qualquer leitura do corpo
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > media.MEDIA_MAX_BYTES + MULTIPART_OVERHEAD:
+        raise _too_large()
+
+
+def request_chunks(request: Request) -> Iterator[bytes]:
+    # Blocos do corpo para uma rota sync; sem Content-Length o total também é limitado aqui
+    stream = request.stream()
+    total = 0
+    while True:
+        try:
+            chunk = anyio.from_thread.run(stream.__anext__)
+        except StopAsyncIteration:
+            return
+        total += len(chunk)
+        if total > media.MEDIA_MAX_BYTES + MULTIPART_OVERHEAD:
+            raise _too_large()
+        if chunk:
+            yield chunk
+
+
+def multipart_file(chunks: Iterable[bytes], content_type: str, field: str) -> Iterator[Tuple[str, object]]:
+    # Percorre o multipart em blocos e devolve só o que interessa do campo `field`:
+    # ("type", content type da parte), depois ("data", bytes) várias vezes e ("end", None)
+    kind, options = parse_options_header(content_type)
+    boundary = options.get(b"boundary")
+    if kind != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Envie o arquivo como multipart/form-data.")
+
+    events = []
+    part = {"headers": {}, "name": b"", "value": b"", "wanted": False}
+
+    def on_part_begin():
+        part.update(headers={}, wanted=False)
+
+    def on_header_field(data, start, end):
+        part["name"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["name"].lower()] = part["value"]
+        part.update(name=b"", value=b"")
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        part["wanted"] = disposition.get(b"name") == field.encode()
+        if part["wanted"]:
+            events.append(("type", part["headers"].get(b"content-type", b"").decode("latin-1")))
+
+    def on_part_data(data, start, end):
+        if part["wanted"]:
+            events.append(("data", bytes(data[start:end])))
+
+    def on_part_end():
+        if part["wanted"]:
+            events.append(("end", None))
+            part["wanted"] = False
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    try:
+        for chunk in chunks:
+            parser.write(chunk)
+            yield from events
+            events.clear()
+        parser.finalize()
+    except MultipartParseError:
+        raise HTTPException(status_code=400, detail="Corpo multipart inválido.")
+    yield from events
+
+
+def receive_upload(request: Request) -> Tuple[str, Tuple[str, str, int, bool]]:
+    # Grava o campo `file` do corpo; devolve (content type, resultado do MediaWriter.finish)
+    content_type = None
+    extension = None
+    with media.MediaWriter() as writer:
+        for kind, value in multipart_file(request_chunks(request), request.headers.get("content-type", ""), UPLOAD_FIELD):
+            if kind == "type":
+                content_type = value.split(";")[0].strip().lower()
+                extension = media.IMAGE_TYPES.get(content_type) or media.VIDEO_TYPES.get(content_type)
+                if not extension:
+                    raise HTTPException(status_code=415, detail="Tipo de arquivo não suportado.")
+            elif kind == "data":
+                try:
+                    writer.write(value)
+                except media.MediaTooLarge:
+                    raise _too_large()
+            else:
+                # o resto do corpo (outros campos) não interessa
+                return content_type, writer.finish(extension)
+    raise HTTPException(status_code=400, detail=f"Envie o arquivo no campo {UPLOAD_FIELD}.")
+
+
+# Enviar imagem ou vídeo de um post
+@router.post(
+    "/posts/{post_id}/media",
+    response_model=PostWithMedia,
+    dependencies=[Depends(check_upload_size)],
+    openapi_extra=UPLOAD_OPENAPI,
+)
+def upload_media(
+    post_id: int,
+    request: Request,
+    user_id: int = Depends(auth.get_current_user_id),
+    session: Session = Depends(get_session)
+):
+    post = session.get(Post, post_id)
+    if not post:
+        raise HTTPException(status_code=404, detail="Post não encontrado.")
+    if post.user_id != user_id:
+        raise HTTPException(status_code=403, detail="Você só pode editar seus próprios posts.")
+
+    content_type, (digest, name, size, deduplicated) = receive_upload(request)
+
+    variants = {}
+    if content_type in media.IMAGE_TYPES:
+        post.image_url = media.media_url(name)
+        variants = media.schedule_variants(digest, name)
+    else:
+        post.video_url = media.media_url(name)
+    session.commit()
+    session.refresh(post)
+    cache.on_post_changed(post_id)
+    events.bus.publish("post_updated", post.model_dump(mode="json"))
+
+    info = MediaInfo(
+        url=media.media_url(name),
+        sha256=digest,
+        size=size,
+        content_type=content_type,
+        deduplicated=deduplicated,
+        variants=variants,
+    )
+    return PostWithMedia(post=post, media=info)
+
+
+# Baixar mídia: o FileResponse lê o arquivo em blocos e atende Range (vídeo com seek)
+@router.get("/media/{name}")
+def get_media(name: str, request: Request):
+    if not media.MEDIA_NAME.match(name):
+        raise HTTPException(status_code=404, detail="Mídia não encontrada.")
+    path = media.media_path(name)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Mídia não encontrada.")
+
+    # O nome é o hash do conteúdo, então ele mesmo serve de ETag forte
+    etag = f'"{name}"'
+    headers = {"ETag": etag, "Cache-Control": media.MEDIA_CACHE_CONTROL}
+    if cache.etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, headers=headers)
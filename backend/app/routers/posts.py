@@ -1,123 +1,366 @@
-from fastapi import APIRouter, HTTPException, Depends, Body, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select
-from typing import List, Optional
-from ..models import Post, PostWithLikes, PostCreate, Like, LikeType
-from ..db import get_session
+from sqlalchemy import or_
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+from ..models import SQLITE_MAX_INT, SQLITE_MIN_INT, Post, PostWithLikes, PostCreate, PostSearchResult, Like, LikeType
+from ..db import read_engine, get_read_session, get_session
+from .. import auth, cache, events, search, serialization
+import base64
 import enum
+import math
+import orjson
 router = APIRouter(prefix="/posts")
+'''
+A lógica de cada rota fica em funções que recebem uma Session sync (add_post, feed_response...).
+As rotas daqui chamam essas funções direto; as de async_posts.py chamam as mesmas funções
+pelo AsyncSession.run_sync, então as duas versões só diferem na sessão e nos awaits.
+'''
 
-# Criar post
-@router.post("/", response_model=Post)
-def create_post(post: PostCreate, session: Session = Depends(get_session)):
-    new_post = Post(content=post.content, user_id=post.user_id)
+
+def add_post(session: Session, content: str, user_id: int) -> Post:
+    new_post = Post(content=content, user_id=user_id)
     session.add(new_post)
     session.commit()
     session.refresh(new_post)
+    cache.on_post_changed()
+    events.bus.publish("post_created", new_post.model_dump(mode="json"))
     return new_post
 
+
+# Criar post
+@router.post("/", response_model=Post)
+def create_post(
+    post: PostCreate,
+    user_id: int = Depends(auth.get_current_user_id),
+    session: Session = Depends(get_session)
+):
+    return add_post(session, post.content, user_id)
+
+# Streaming NDJSON
+'''
+Com o header `Accept: application/x-ndjson` (ou `?stream=1`) as listagens de posts
+são enviadas como NDJSON (um post por linha) com StreamingResponse.
+Os posts são lidos em blocos de STREAM_CHUNK_SIZE, paginando pelo id, então a
+memória usada não depende do tamanho da tabela.
+O gerador abre sua própria sessão, porque a sessão do Depends já foi fechada
+quando a resposta começa a ser enviada.
+'''
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_CHUNK_SIZE = 500
+
+
+def wants_stream(request: Request, stream: bool) -> bool:
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def posts_statement(*criteria):
+    # Só as colunas do model, sem montar objetos do ORM (ver serialization.py)
+    return select(*serialization.POST_COLUMNS).where(*criteria)
+
+
+def stream_chunk_statement(last_id: int, *criteria):
+    return (
+        posts_statement(Post.id > last_id, *criteria)
+        .order_by(Post.id)
+        .limit(STREAM_CHUNK_SIZE)
+    )
+
+
+def _stream_posts(*criteria):
+    last_id = 0
+    while True:
+        with Session(read_engine) as session:
+            chunk = session.exec(stream_chunk_statement(last_id, *criteria)).all()
+            lines = stream_lines(chunk)
+        if not chunk:
+            break
+        yield lines
+        last_id = chunk[-1].id
+
+
+def stream_lines(chunk) -> bytes:
+    return b"".join(orjson.dumps(post) + b"\n" for post in serialization.rows_to_dicts(serialization.POST_FIELDS, chunk))
+
+
+def posts_response(session: Session, request: Request, *criteria) -> Response:
+    rows = session.exec(posts_statement(*criteria)).all()
+    return serialization.render(request, serialization.rows_to_dicts(serialization.POST_FIELDS, rows))
+
+
 # Listar todos os posts
 @router.get("/", response_model=List[Post])
-def list_posts(session: Session = Depends(get_session)):
-    posts = session.exec(select(Post)).all()
-    return posts
+def list_posts(
+    request: Request,
+    stream: bool = Query(False, description="Envia os posts como NDJSON"),
+    session: Session = Depends(get_read_session)
+):
+    if wants_stream(request, stream):
+        return StreamingResponse(_stream_posts(), media_type=NDJSON_MEDIA_TYPE)
+    return posts_response(session, request)
 
 # Listar posts de um usuário
 @router.get("/user/{user_id}", response_model=List[Post])
-def list_user_posts(user_id: int, session: Session = Depends(get_session)):
-    posts = session.exec(select(Post).where(Post.user_id == user_id)).all()
-    return posts
+def list_user_posts(
+    user_id: int,
+    request: Request,
+    stream: bool = Query(False, description="Envia os posts como NDJSON"),
+    session: Session = Depends(get_read_session)
+):
+    if wants_stream(request, stream):
+        return StreamingResponse(_stream_posts(Post.user_id == user_id), media_type=NDJSON_MEDIA_TYPE)
+    return posts_response(session, request, Post.user_id == user_id)
 
 # FEED: Listar posts com contagem de likes/dislikes
+'''
+A página do feed é montada com uma única query: seleciona os posts (ordenados por
+created_at e id, do mais novo para o mais antigo) com os contadores de likes/dislikes
+do próprio post. A reação do usuário logado vem de uma segunda query, só com os ids
+da página, e é aplicada por cima.
+As duas partes ficam no cache (cache.py): a página anônima é a mesma para todos os
+usuários, e as reações são guardadas por usuário.
+A paginação é por cursor (keyset): o cursor da próxima página vem no header
+X-Next-Cursor e deve ser enviado de volta no parâmetro `cursor`.
+Com `sort=top` (saldo de likes) ou `sort=hot` (saldo com decaimento no tempo) a chave
+da ordenação troca de created_at para o score, que tem índice (ver ranking.py).
+'''
+FEED_DEFAULT_LIMIT = 20
+FEED_MAX_LIMIT = 100
+
+
+class FeedSort(str, enum.Enum):
+    NEW = "new"
+    TOP = "top"
+    HOT = "hot"
+
+
+def _sort_key(sort: FeedSort):
+    # A expressão tem que ser igual à dos índices ix_post_net_votes/ix_post_hot_score
+    if sort is FeedSort.TOP:
+        return Post.likes_count - Post.dislikes_count
+    if sort is FeedSort.HOT:
+        return Post.hot_score
+    return Post.created_at
+
+
+def _encode_cursor(value, post_id: int) -> str:
+    raw = f"{value.isoformat() if isinstance(value, datetime) else repr(value)}|{post_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _cursor_int(value: str) -> int:
+    number = int(value)
+    if not SQLITE_MIN_INT <= number <= SQLITE_MAX_INT:
+        raise ValueError("fora da faixa do INTEGER do SQLite")
+    return number
+
+
+def _cursor_float(value: str) -> float:
+    number = float(value)
+    if not math.isfinite(number):  # nan e inf não são scores válidos
+        raise ValueError("score não finito")
+    return number
+
+
+def _decode_cursor(cursor: str, sort: FeedSort = FeedSort.NEW) -> Tuple[object, int]:
+    parse = {FeedSort.NEW: datetime.fromisoformat, FeedSort.TOP: _cursor_int, FeedSort.HOT: _cursor_float}[sort]
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        value, post_id = raw.split("|")
+        return parse(value), _cursor_int(post_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+
+
+def feed_statement(limit: int, cursor: Optional[str], sort: FeedSort = FeedSort.NEW):
+    # Página de posts, usando (chave da ordenação, id) como chave
+    key = _sort_key(sort)
+    statement = select(
+        Post.id,
+        Post.content,
+        Post.user_id,
+        Post.created_at,
+        Post.likes_count,
+        Post.dislikes_count,
+        key
+    )
+    if cursor:
+        cursor_value, cursor_id = _decode_cursor(cursor, sort)
+        # O `key <= cursor` separado deixa o SQLite começar a leitura do índice no cursor
+        statement = statement.where(
+            key <= cursor_value,
+            or_(key < cursor_value, Post.id < cursor_id)
+        )
+    return statement.order_by(key.desc(), Post.id.desc()).limit(limit)
+
+
+def reactions_statement(user_id: int, post_ids):
+    # Reações de um usuário em um conjunto de posts
+    return select(Like.post_id, Like.type).where(Like.user_id == user_id, Like.post_id.in_(post_ids))
+
+
+def feed_page(rows, limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    # Posts no formato do PostWithLikes (dicts, ver serialization.py);
+    # a última coluna de cada linha é a chave da ordenação (ver feed_statement)
+    posts = [serialization.summary_dict(row) for row in rows]
+    next_cursor = None
+    if len(posts) == limit:
+        next_cursor = _encode_cursor(rows[-1][-1], posts[-1]["id"])
+    return posts, next_cursor
+
+
+def apply_reactions(posts: List[Dict[str, Any]], reactions: Dict[int, LikeType]) -> List[Dict[str, Any]]:
+    # Os posts do cache são compartilhados, então a reação vai numa cópia
+    return [
+        {**post, "user_like_type": reactions[post["id"]]} if post["id"] in reactions else post
+        for post in posts
+    ]
+
+
+def with_user_reactions(session: Session, posts: List[Dict[str, Any]], user_id: Optional[int], version: int):
+    # Reações do usuário nos posts (do cache ou de uma query só), aplicadas por cima
+    if not user_id or not posts:
+        return posts
+    key = ("reactions", user_id, tuple(post["id"] for post in posts))
+    reactions = cache.feed_cache.get(key)
+    if reactions is cache.MISSING:
+        reactions = dict(session.exec(reactions_statement(user_id, key[2])).all())
+        cache.feed_cache.set(key, reactions, version)
+    return apply_reactions(posts, reactions)
+
+
+def feed_response(
+    session: Session, request: Request, version: int,
+    user_id: Optional[int], limit: int, cursor: Optional[str], sort: FeedSort
+) -> Response:
+    # version vem de cache.current_version() (ou current_version_async nas rotas async)
+    key = cache.feed_key(sort.value, limit, cursor)
+    etag = cache.make_etag(version, *key, user_id, serialization.negotiated_type(request))
+    if cache.etag_matches(request, etag):
+        return cache.not_modified(etag)
+
+    page = cache.feed_cache.get(key)
+    if page is cache.MISSING:
+        page = feed_page(session.exec(feed_statement(limit, cursor, sort)).all(), limit)
+        cache.feed_cache.set(key, page, version)
+    posts, next_cursor = page
+
+    response = serialization.render(request, with_user_reactions(session, posts, user_id, version))
+    cache.set_etag(response, etag)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+
 @router.get("/feed", response_model=List[PostWithLikes])
 def list_posts_with_likes(
-    session: Session = Depends(get_session),
-    user_id: Optional[int] = Query(None, description="ID do usuário logado (opcional)")
+    request: Request,
+    session: Session = Depends(get_read_session),
+    user_id: Optional[int] = Query(None, description="ID do usuário logado (opcional)"),
+    limit: int = Query(FEED_DEFAULT_LIMIT, ge=1, le=FEED_MAX_LIMIT, description="Quantidade de posts por página"),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (header X-Next-Cursor)"),
+    sort: FeedSort = Query(FeedSort.NEW, description="new (mais recentes), top (saldo de likes) ou hot (saldo com decaimento)")
 ):
-    posts = session.exec(select(Post)).all()
-    result = []
-
-    for post in posts:
-        # Corrigindo a contagem de likes
-        likes = session.exec(
-            select(Like).where(
-                Like.post_id == post.id,
-                Like.type == LikeType.LIKE
-            )
-        ).all()
-        likes_count = len(likes)
-
-        # Corrigindo a contagem de dislikes
-        dislikes = session.exec(
-            select(Like).where(
-                Like.post_id == post.id,
-                Like.type == LikeType.DISLIKE
-            )
-        ).all()
-        dislikes_count = len(dislikes)
-
-        # Verificando se o usuário atual deu like/dislike
-        user_like_type = None
-        if user_id:
-            user_like = session.exec(
-                select(Like).where(
-                    Like.post_id == post.id,
-                    Like.user_id == user_id
-                )
-            ).first()
-            if user_like:
-                user_like_type = user_like.type
-
-        # Criando o objeto PostWithLikes
-        result.append(PostWithLikes(
-            id=post.id,
-            content=post.content,
-            user_id=post.user_id,
-            likes_count=likes_count,
-            dislikes_count=dislikes_count,
-            user_like_type=user_like_type
-        ))
-
-    return result
+    return feed_response(session, request, cache.current_version(), user_id, limit, cursor, sort)
 
-# Buscar post por ID
-@router.get("/{post_id}", response_model=Post)
-def get_post(post_id: int, session: Session = Depends(get_session)):
+# Buscar posts pelo conteúdo (FTS5, ver search.py)
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+
+@router.get("/search", response_model=List[PostSearchResult])
+def search_posts(
+    request: Request,
+    q: str = Query(..., min_length=1, description="Texto a ser buscado"),
+    limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT, description="Quantidade de resultados por página"),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (header X-Next-Cursor)"),
+    session: Session = Depends(get_read_session)
+):
+    if not q.split():
+        raise HTTPException(status_code=400, detail="Informe um texto para buscar.")
+    position = None
+    if cursor:
+        try:
+            position = search.decode_search_cursor(cursor)
+        except (ValueError, UnicodeDecodeError):
+            raise HTTPException(status_code=400, detail="Cursor inválido.")
+
+    rows = session.exec(search.search_statement(q, limit, position)).all()
+    headers = {}
+    if len(rows) == limit:
+        headers["X-Next-Cursor"] = search.encode_search_cursor(rows[-1].rank, rows[-1].id)
+    # A coluna rank fica por último no SELECT e não entra na resposta (ver search.py)
+    results = serialization.rows_to_dicts(serialization.SEARCH_FIELDS, rows)
+    for result in results:
+        result["snippet"] = search.highlight(result["snippet"])
+    return serialization.render(request, results, headers)
+
+# Eventos ao vivo do feed (Server-Sent Events, ver events.py)
+EVENT_STREAM_MEDIA_TYPE = "text/event-stream"
+
+
+@router.get("/stream")
+async def stream_events():
+    return StreamingResponse(
+        events.event_stream(),
+        media_type=EVENT_STREAM_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def load_post(session: Session, post_id: int) -> Post:
     post = session.get(Post, post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post não encontrado.")
     return post
 
+
+def owned_post(session: Session, post_id: int, user_id: int, action: str) -> Post:
+    post = load_post(session, post_id)
+    if post.user_id != user_id:
+        raise HTTPException(status_code=403, detail=f"Você só pode {action} seus próprios posts.")
+    return post
+
+
+def change_post(session: Session, post_id: int, user_id: int, content: str) -> Post:
+    post = owned_post(session, post_id, user_id, "editar")
+    post.content = content
+    # Atualize outros campos se quiser
+    session.commit()
+    session.refresh(post)
+    cache.on_post_changed(post_id)
+    events.bus.publish("post_updated", post.model_dump(mode="json"))
+    return post
+
+
+def remove_post(session: Session, post_id: int, user_id: int) -> dict:
+    session.delete(owned_post(session, post_id, user_id, "deletar"))
+    session.commit()
+    cache.on_post_changed(post_id)
+    events.bus.publish("post_deleted", {"id": post_id})
+    return {"message": "Post deletado com sucesso."}
+
+
+# Buscar post por ID
+@router.get("/{post_id}", response_model=Post)
+def get_post(post_id: int, session: Session = Depends(get_read_session)):
+    return load_post(session, post_id)
+
 # Atualizar post
 @router.put("/{post_id}", response_model=Post)
 def update_post(
     post_id: int,
     post_data: PostCreate,
-    user_id: int = Body(..., embed=True),
+    user_id: int = Depends(auth.get_current_user_id),
     session: Session = Depends(get_session)
 ):
-    post = session.get(Post, post_id)
-    if not post:
-        raise HTTPException(status_code=404, detail="Post não encontrado.")
-    if post.user_id != user_id:
-        raise HTTPException(status_code=403, detail="Você só pode editar seus próprios posts.")
-    post.content = post_data.content
-    # Atualize outros campos se quiser
-    session.commit()
-    session.refresh(post)
-    return post
+    return change_post(session, post_id, user_id, post_data.content)
 
 # Deletar post
 @router.delete("/{post_id}")
 def delete_post(
     post_id: int,
-    user_id: int = Query(..., description="ID do usuário que está tentando deletar"),
+    user_id: int = Depends(auth.get_current_user_id),
     session: Session = Depends(get_session)
 ):
-    post = session.get(Post, post_id)
-    if not post:
-        raise HTTPException(status_code=404, detail="Post não encontrado.")
-    if post.user_id != user_id:
-        raise HTTPException(status_code=403, detail="Você só pode deletar seus próprios posts.")
-    session.delete(post)
-    session.commit()
-    return {"message": "Post deletado com sucesso."}
\ No newline at end of file
+    return remove_post(session, post_id, user_id)
\ No newline at end of file
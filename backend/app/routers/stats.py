@@ -0,0 +1,39 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from .. import auth, cache, coherence, events, metrics
+'''
+Rotas de observabilidade: estatísticas do cache (feed e sessões), dos eventos e métricas por rota (Prometheus)
+Com vários workers (app.serve) os números são do worker que atendeu a requisição.
+'''
+router = APIRouter()
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+@router.get("/cache/stats")
+def cache_stats():
+    return cache.feed_cache.stats()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    lines = [metrics.registry.render()]
+    caches = (
+        ("feed_cache", cache.feed_cache.stats()),
+        ("session_cache", auth.session_cache.stats()),
+        ("unknown_token_cache", auth.unknown_tokens.stats()),
+    )
+    for prefix, stats in caches:
+        for name, value in stats.items():
+            if name in ("hits", "misses", "evictions", "expirations", "invalidations"):
+                lines.append(f"# TYPE {prefix}_{name}_total counter\n{prefix}_{name}_total {value}\n")
+            elif name in ("size", "version"):
+                lines.append(f"# TYPE {prefix}_{name} gauge\n{prefix}_{name} {value}\n")
+    bus = events.bus.stats()
+    lines.append(f"# TYPE events_subscribers gauge\nevents_subscribers {bus['subscribers']}\n")
+    lines.append(f"# TYPE events_published_total counter\nevents_published_total {bus['published']}\n")
+    lines.append(f"# TYPE events_lagged_total counter\nevents_lagged_total {bus['lagged']}\n")
+    if coherence.log.enabled:
+        shared = coherence.log.stats()
+        lines.append(f"# TYPE coherence_version gauge\ncoherence_version {shared['version']}\n")
+        lines.append(f"# TYPE coherence_resets_total counter\ncoherence_resets_total {shared['resets']}\n")
+    return PlainTextResponse("".join(lines), media_type=PROMETHEUS_MEDIA_TYPE)
@@ -1,52 +1,124 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.security import HTTPAuthorizationCredentials
 from sqlmodel import Session, select
-from ..models import User, UserCreate, UserLogin
-from ..db import get_session
+from typing import Optional
+from ..models import User, UserCreate, UserLogin, UserPublic
+from ..db import get_read_session, get_session
+from .. import auth
 '''
 User, UserCreate e UserLogin são importados do arquivo models.py
 get_session é importado do arquivo db.py, vai servir para conectar com o banco de dados
+auth tem o hash das senhas e os tokens de sessão (ver auth.py)
 '''
 router = APIRouter(prefix="/users")
+'''
+As funções que recebem a Session são usadas também pelo async_users.py (pelo AsyncSession.run_sync).
+O hash e a verificação da senha ficam fora delas, porque são lentos: aqui a rota é sync
+(roda no threadpool) e no async_users.py eles rodam no asyncio.to_thread.
+'''
 
-@router.post("/register")
-def register_user(user: UserCreate, session: Session = Depends(get_session)):
-    # Verifica se já existe um usuário com esse username
-    statement = select(User).where(User.username == user.username)
-    existing_user = session.exec(statement).first()
-    if existing_user:
+
+def find_user(session: Session, username: str) -> Optional[User]:
+    return session.exec(select(User).where(User.username == username)).first()
+
+
+def check_username_free(session: Session, username: str):
+    if find_user(session, username):
         raise HTTPException(status_code=400, detail="Nome de usuário já existe.")
 
-    # Cria um novo usuário a partir do modelo UserCreate
-    new_user = User(username=user.username, password=user.password)
+
+def add_user(session: Session, username: str, password_hash: str) -> User:
+    new_user = User(username=username, password=password_hash)
     session.add(new_user)
     session.commit()
     session.refresh(new_user)
     return new_user
+
+
+@router.post("/register", response_model=UserPublic)
+def register_user(user: UserCreate, session: Session = Depends(get_session)):
+    # Verifica se já existe um usuário com esse username
+    check_username_free(session, user.username)
+    # Cria um novo usuário a partir do modelo UserCreate
+    return add_user(session, user.username, auth.hash_password(user.password))
 '''
 ROTA DE REGISTRO DE USUÁRIO
 Recebe um objeto UserCreate, contendo nome e senha do usuário.
-Esse if serve pra verificar se o nome já existe no banco
+O check_username_free verifica se o nome já existe no banco
     Existindo um usuário com o mesmo nome, ele retorna um erro 400, informando que o nome já existe.
-    Caso contrário, ele cria um novo usuário a partir do modelo UserCreate, adiciona o novo usuário à sessão e faz o commit para salvar as alterações no banco de dados.
-Por fim, ele retorna o novo usuário criado.
+    Caso contrário, ele cria um novo usuário a partir do modelo UserCreate (com o hash da senha), adiciona o novo usuário à sessão e faz o commit para salvar as alterações no banco de dados.
+Por fim, ele retorna o novo usuário criado (sem a senha, modelo UserPublic).
 '''
 
 
+def check_password(user: Optional[User], password: str) -> Optional[str]:
+    # Lento (hash); devolve o hash novo da senha se o guardado precisa ser trocado
+    if not auth.verify_password(password, user.password if user else None):
+        raise HTTPException(status_code=401, detail="Nome de usuário ou senha incorretos.")
+    if auth.needs_rehash(user.password):
+        return auth.hash_password(password)
+    return None
+
+
+def start_session(session: Session, user: User, new_password_hash: Optional[str]) -> dict:
+    if new_password_hash:
+        user.password = new_password_hash
+    for expired in session.exec(auth.expired_sessions_statement(user.id)).all():
+        session.delete(expired)
+    token, record = auth.new_session(user.id)
+    session.add(record)
+    session.commit()
+    auth.remember_session(record)
+    return auth.login_response(user.id, token, record)
+
+
 @router.post("/login")
 def login(
     data: UserLogin,
     session: Session = Depends(get_session)
 ):
-    statement = select(User).where(User.username == data.username)
-    user = session.exec(statement).first()
-    if not user or user.password != data.password:
-        raise HTTPException(status_code=401, detail="Nome de usuário ou senha incorretos.")
-    return {"message": "Login realizado com sucesso!", "user_id": user.id}
+    user = find_user(session, data.username)
+    return start_session(session, user, check_password(user, data.password))
 
 '''
 ROTA DE LOGIN DE USUÁRIO
 Recebe um objeto UserLogin, contendo nome e senha do usuário.
 Busca o usuário pelo username
 Se não encontrar ou a senha estiver incorreta, retorna um erro 401, informando que o nome ou a senha estão incorretos.
-Caso contrario, retorna mensagem dizendo que deu certo junto com o id do usuário.
-'''
\ No newline at end of file
+Caso contrario, cria uma sessão e retorna mensagem dizendo que deu certo junto com o id do usuário
+e o access_token, que deve ir no header Authorization: Bearer <token> das rotas de escrita.
+Senhas antigas, em texto puro, são trocadas pelo hash nesse momento.
+'''
+
+
+def end_session(session: Session, credentials: Optional[HTTPAuthorizationCredentials]) -> dict:
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Faça login para continuar.")
+    token_hash = auth.token_digest(credentials.credentials)
+    session.exec(auth.delete_session_statement(token_hash))
+    session.commit()
+    auth.forget_session(token_hash)
+    return {"message": "Logout realizado com sucesso."}
+
+
+def load_user(session: Session, user_id: int) -> User:
+    user = session.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="Usuário não encontrado.")
+    return user
+
+
+@router.post("/logout")
+def logout(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(auth.bearer_scheme),
+    session: Session = Depends(get_session)
+):
+    return end_session(session, credentials)
+
+
+@router.get("/me", response_model=UserPublic)
+def current_user(
+    user_id: int = Depends(auth.get_current_user_id),
+    session: Session = Depends(get_read_session)
+):
+    return load_user(session, user_id)
@@ -0,0 +1,135 @@
+from sqlalchemy import DateTime, inspect, text
+from sqlalchemy.engine import Connection
+from typing import Optional, Tuple
+from .models import SQLITE_MAX_INT, SQLITE_MIN_INT
+import base64
+import html
+import math
+'''
+Busca textual em Post.content usando uma tabela virtual FTS5 do SQLite (post_fts).
+
+A post_fts é uma tabela "external content": ela guarda só o índice e lê o texto da
+própria tabela post (content_rowid = post.id). Os triggers abaixo mantêm o índice
+atualizado a cada INSERT/UPDATE/DELETE em post, seja pelas rotas ou por carga em massa.
+
+O snippet devolvido na busca é HTML: o trecho do post vem escapado (html.escape) e só as
+marcações <mark>…</mark> dos termos encontrados são tags de verdade. O FTS5 marca os termos
+com caracteres de controle (SNIPPET_OPEN/SNIPPET_CLOSE) e highlight() troca pelas tags
+depois do escape, então um post com <script> volta como texto.
+
+Para bancos que já tinham posts antes do índice existir, ou para reconstruir:
+    python -m app.search --rebuild
+'''
+
+SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5(
+        content,
+        content='post',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS post_fts_ai AFTER INSERT ON post BEGIN
+        INSERT INTO post_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS post_fts_ad AFTER DELETE ON post BEGIN
+        INSERT INTO post_fts(post_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS post_fts_au AFTER UPDATE OF content ON post BEGIN
+        INSERT INTO post_fts(post_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO post_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+]
+
+SNIPPET_TOKENS = 12
+# Marcadores neutros do snippet(); viram <mark> e </mark> só depois do escape
+SNIPPET_OPEN = "\x02"
+SNIPPET_CLOSE = "\x03"
+
+
+def ensure_search_index(connection: Connection):
+    # Cria a tabela FTS e os triggers; se o índice acabou de ser criado, preenche com os posts existentes
+    created = not inspect(connection).has_table("post_fts")
+    for statement in SEARCH_DDL:
+        connection.execute(text(statement))
+    if created:
+        rebuild_search_index(connection)
+
+
+def rebuild_search_index(connection: Connection):
+    connection.execute(text("INSERT INTO post_fts(post_fts) VALUES ('rebuild')"))
+
+
+def match_expression(query: str) -> str:
+    # Cada palavra vira um termo entre aspas (assim o usuário não quebra a sintaxe do FTS5);
+    # a última ganha * para buscar por prefixo enquanto a pessoa digita
+    terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def highlight(snippet: str) -> str:
+    return html.escape(snippet).replace(SNIPPET_OPEN, "<mark>").replace(SNIPPET_CLOSE, "</mark>")
+
+
+def encode_search_cursor(rank: float, post_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{rank!r}|{post_id}".encode()).decode()
+
+
+def decode_search_cursor(cursor: str) -> Tuple[float, int]:
+    # ValueError para cursor inválido, inclusive rank nan/inf ou id fora do INTEGER do SQLite
+    raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    rank, post_id = raw.split("|")
+    rank, post_id = float(rank), int(post_id)
+    if not math.isfinite(rank) or not SQLITE_MIN_INT <= post_id <= SQLITE_MAX_INT:
+        raise ValueError("cursor fora da faixa")
+    return rank, post_id
+
+
+def search_statement(query: str, limit: int, cursor: Optional[Tuple[float, int]] = None):
+    # Resultados ordenados por relevância (bm25, menor = melhor) e id, paginados por cursor
+    # O created_at é tipado para voltar como datetime, e não como o texto gravado no SQLite
+    where = ""
+    params = {"match": match_expression(query), "limit": limit}
+    if cursor:
+        where = "AND (post_fts.rank > :rank OR (post_fts.rank = :rank AND post_fts.rowid > :post_id))"
+        params.update(rank=cursor[0], post_id=cursor[1])
+    return text(f"""
+        SELECT post.id, post.content, post.user_id, post.created_at,
+               snippet(post_fts, 0, char(2), char(3), '…', {SNIPPET_TOKENS}) AS snippet,
+               post_fts.rank AS rank
+        FROM post_fts
+        JOIN post ON post.id = post_fts.rowid
+        WHERE post_fts MATCH :match {where}
+        ORDER BY post_fts.rank, post_fts.rowid
+        LIMIT :limit
+    """).bindparams(**params).columns(created_at=DateTime)
+
+
+def main(argv=None):
+    import argparse
+    from .db import engine
+
+    parser = argparse.ArgumentParser(description="Índice de busca (FTS5) dos posts.")
+    parser.add_argument("--rebuild", action="store_true", help="reconstrói o índice a partir da tabela post")
+    args = parser.parse_args(argv)
+
+    from .migrations import migrate
+    migrate(engine)
+    with engine.begin() as connection:
+        if args.rebuild:
+            rebuild_search_index(connection)
+        total = connection.execute(text("SELECT count(*) FROM post")).scalar()
+    print(f"Índice de busca pronto ({total} posts).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+'''
+Sobe o app com vários workers (processos) no mesmo rede.db.
+
+Uso (dentro da pasta backend):
+    python -m app.serve --workers 4 --port 8000
+
+1. aplica as migrações (e move as mídias de uploads/media, ver media.py) uma vez, antes
+   de existir qualquer worker (nenhum worker migra em paralelo com outro);
+2. sobe N processos do uvicorn, que dividem o mesmo socket e importam o app.main;
+3. neste processo (o supervisor do uvicorn) roda, uma vez só, o recálculo do hot_score
+   e a poda do log compartilhado; os workers não iniciam o hot_score_refresher.
+Os caches de cada worker (feed, sessões, eventos SSE) ficam coerentes pelo log
+compartilhado (coherence.py), sem nenhum serviço externo.
+Com --workers 1 é o mesmo que rodar o uvicorn direto.
+
+Não rode `uvicorn app.main:app --workers N` direto: sem o APP_WORKERS os workers não
+veem as escritas uns dos outros e os caches ficam velhos até o TTL.
+'''
+
+logger = logging.getLogger("app.serve")
+
+
+def maintenance(engine, stop: threading.Event):
+    # Tarefas que devem rodar em um processo só: hot_score e poda do log
+    from . import cache, coherence
+    from .ranking import HOT_REFRESH_SECONDS, refresh_hot_scores
+
+    interval = coherence.COHERENCE_PRUNE_SECONDS
+    if HOT_REFRESH_SECONDS > 0:
+        interval = min(interval, HOT_REFRESH_SECONDS)
+    next_refresh = time.monotonic() + HOT_REFRESH_SECONDS
+    while not stop.wait(interval):
+        try:
+            if HOT_REFRESH_SECONDS > 0 and time.monotonic() >= next_refresh:
+                updated = refresh_hot_scores(engine)
+                cache.on_scores_refreshed()
+                next_refresh = time.monotonic() + HOT_REFRESH_SECONDS
+                logger.info("hot_score recalculado em %d posts", updated)
+            pruned = coherence.log.prune(engine)
+            if pruned:
+                logger.info("%d linhas antigas removidas do log compartilhado", pruned)
+        except Exception:
+            logger.exception("falha na manutenção")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sobe o app com vários workers.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processos (padrão: número de CPUs)")
+    parser.add_argument("--timeout-graceful-shutdown", type=int, default=5, help="segundos esperando as conexões SSE ao parar")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper())
+
+    import uvicorn
+    from . import coherence
+    from .db import engine
+    from .media import move_legacy_media
+    from .migrations import migrate
+
+    version = migrate(engine)
+    move_legacy_media()
+    engine.dispose()
+    # Os workers herdam o ambiente e ligam o log compartilhado; aqui ele é ligado depois da
+    # migração, então as novas conexões de escrita deste processo já abrem com os triggers
+    os.environ["APP_WORKERS"] = str(args.workers)
+    # o mesmo BOOT_ID nos ETags de todos os workers, novo a cada vez que o app sobe (ver cache.py)
+    os.environ["APP_BOOT_ID"] = secrets.token_hex(4)
+    coherence.log.enabled = args.workers > 1
+    logger.info("banco na versão %d, subindo %d workers", version, args.workers)
+
+    stop = threading.Event()
+    thread = None
+    if args.workers > 1:
+        thread = threading.Thread(target=maintenance, args=(engine, stop), name="maintenance", daemon=True)
+        thread.start()
+    try:
+        uvicorn.run(
+            "app.main:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            timeout_graceful_shutdown=args.timeout_graceful_shutdown,
+            log_level=args.log_level,
+        )
+    finally:
+        stop.set()
+        if thread:
+            thread.join(timeout=args.timeout_graceful_shutdown)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,6 @@
+'''
+Benchmark da API:
+    seed.py     gera um banco SQLite de teste com muitos usuários, posts e likes
+    run.py      roda uma carga mista contra o app (em processo, via ASGI) e salva o resultado em JSON
+    report.py   calcula p50/p95/p99 e vazão por rota e compara duas execuções
+'''
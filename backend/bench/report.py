@@ -0,0 +1,106 @@
+from typing import Dict, List
+import argparse
+import json
+import sys
+'''
+Estatísticas do benchmark: latência p50/p95/p99 e vazão por rota, e comparação entre duas execuções.
+
+Uso (dentro da pasta backend):
+    python -m bench.report resultado.json
+    python -m bench.report resultado.json --compare base.json --threshold 0.10
+'''
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    # Percentil por interpolação linear; a lista precisa estar ordenada
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(samples: Dict[str, List[float]], errors: Dict[str, int], elapsed: float) -> dict:
+    # samples: rota -> latências em segundos; o resultado é em milissegundos
+    routes = {}
+    for route, latencies in sorted(samples.items()):
+        latencies = sorted(latencies)
+        routes[route] = {
+            "count": len(latencies),
+            "errors": errors.get(route, 0),
+            "rps": len(latencies) / elapsed if elapsed else 0.0,
+            "mean_ms": 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+            "p50_ms": 1000 * percentile(latencies, 0.50),
+            "p95_ms": 1000 * percentile(latencies, 0.95),
+            "p99_ms": 1000 * percentile(latencies, 0.99),
+            "max_ms": 1000 * latencies[-1] if latencies else 0.0,
+        }
+    everything = sorted(latency for latencies in samples.values() for latency in latencies)
+    total = {
+        "count": len(everything),
+        "errors": sum(errors.values()),
+        "rps": len(everything) / elapsed if elapsed else 0.0,
+        "p50_ms": 1000 * percentile(everything, 0.50),
+        "p95_ms": 1000 * percentile(everything, 0.95),
+        "p99_ms": 1000 * percentile(everything, 0.99),
+        "elapsed_s": elapsed,
+    }
+    return {"routes": routes, "total": total}
+
+
+def format_table(result: dict) -> str:
+    lines = [f"{'rota':<28}{'n':>8}{'erros':>7}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+    for route, stats in result["routes"].items():
+        lines.append(
+            f"{route:<28}{stats['count']:>8}{stats['errors']:>7}{stats['rps']:>10.1f}"
+            f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+        )
+    total = result["total"]
+    lines.append(
+        f"{'TOTAL':<28}{total['count']:>8}{total['errors']:>7}{total['rps']:>10.1f}"
+        f"{total['p50_ms']:>10.2f}{total['p95_ms']:>10.2f}{total['p99_ms']:>10.2f}"
+    )
+    return "\n".join(lines)
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.10) -> List[str]:
+    # Regressão = p95 pior que a base em mais de `threshold`, ou vazão menor na mesma proporção
+    regressions = []
+    for route, stats in current["routes"].items():
+        base = baseline["routes"].get(route)
+        if not base or not base["count"]:
+            continue
+        if base["p95_ms"] and stats["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(f"{route}: p95 {base['p95_ms']:.2f} -> {stats['p95_ms']:.2f} ms")
+        if base["rps"] and stats["rps"] < base["rps"] * (1 - threshold):
+            regressions.append(f"{route}: req/s {base['rps']:.1f} -> {stats['rps']:.1f}")
+    return regressions
+
+
+def load(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mostra e compara resultados do benchmark.")
+    parser.add_argument("result", help="arquivo JSON gerado pelo bench.run")
+    parser.add_argument("--compare", help="arquivo JSON de uma execução base")
+    parser.add_argument("--threshold", type=float, default=0.10, help="piora tolerada (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    result = load(args.result)
+    print(format_table(result))
+    if args.compare:
+        regressions = compare(result, load(args.compare), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSÃO {regression}")
+        if regressions:
+            return 1
+        print("Sem regressões.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+from collections import defaultdict
+from datetime import datetime
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import time
+from . import report
+'''
+Roda uma carga mista contra o app (backend/app/main.py) dentro do próprio processo,
+usando o transporte ASGI do httpx (sem rede e sem uvicorn), e mede cada rota.
+
+Uso (dentro da pasta backend), depois de gerar o banco com bench.seed:
+    python -m bench.run --db /tmp/bench.db --duration 30 --concurrency 16 --out resultado.json
+    python -m bench.run --db /tmp/bench.db --mix feed=5,toggle_like=1 --compare base.json
+
+Atenção: as operações de escrita alteram o banco de benchmark.
+Elas usam tokens de sessão criados direto no banco para os primeiros BENCH_TOKEN_USERS
+usuários (sem passar pelo /users/login, que calcula o hash da senha).
+'''
+
+FEED_CURSORS_KEPT = 200
+SUMMARY_BATCH = 20
+BENCH_TOKEN_USERS = 200
+SEARCH_TERMS = ["café", "python", "feed", "rede", "teste carga", "bom dia", "proj"]
+
+
+async def op_feed(client, rng, state):
+    response = await client.get("/posts/feed")
+    _remember_feed(state, response)
+    return response
+
+
+async def op_feed_user(client, rng, state):
+    response = await client.get("/posts/feed", params={"user_id": rng.randint(1, state["users"])})
+    _remember_feed(state, response)
+    return response
+
+
+async def op_feed_next_page(client, rng, state):
+    if not state["cursors"]:
+        return await op_feed(client, rng, state)
+    response = await client.get("/posts/feed", params={"cursor": rng.choice(state["cursors"])})
+    _remember_feed(state, response)
+    return response
+
+
+async def op_feed_ranked(client, rng, state):
+    return await client.get("/posts/feed", params={"sort": rng.choice(["top", "hot"])})
+
+
+async def op_feed_revalidate(client, rng, state):
+    # Cliente fazendo polling com If-None-Match (caminho do 304)
+    headers = {"If-None-Match": state["feed_etag"]} if state["feed_etag"] else {}
+    response = await client.get("/posts/feed", headers=headers)
+    if response.headers.get("etag"):
+        state["feed_etag"] = response.headers["etag"]
+    return response
+
+
+async def op_post_likes(client, rng, state):
+    return await client.get(f"/likes/post/{_random_post(rng, state)}", params={"user_id": rng.randint(1, state["users"])})
+
+
+async def op_likes_summary(client, rng, state):
+    ids = ",".join(str(_random_post(rng, state)) for _ in range(SUMMARY_BATCH))
+    return await client.get("/likes/summary", params={"post_ids": ids, "user_id": rng.randint(1, state["users"])})
+
+
+async def op_user_posts(client, rng, state):
+    return await client.get(f"/posts/user/{rng.randint(1, state['users'])}")
+
+
+async def op_search(client, rng, state):
+    return await client.get("/posts/search", params={"q": rng.choice(SEARCH_TERMS)})
+
+
+async def op_toggle_like(client, rng, state):
+    post_id = _random_post(rng, state)
+    return await client.post(
+        f"/likes/{post_id}",
+        headers=_auth_headers(rng, state),
+        json={"post_id": post_id, "type": rng.choice(["like", "dislike"])},
+    )
+
+
+async def op_like_batch(client, rng, state):
+    reactions = [
+        {"post_id": _random_post(rng, state), "type": rng.choice(["like", "dislike"])}
+        for _ in range(SUMMARY_BATCH)
+    ]
+    return await client.post("/likes/batch", headers=_auth_headers(rng, state), json={"reactions": reactions})
+
+
+async def op_create_post(client, rng, state):
+    content = " ".join(rng.choices(SEARCH_TERMS, k=8))
+    return await client.post("/posts/", headers=_auth_headers(rng, state), json={"content": content})
+
+
+# nome -> (rota usada no relatório, função, peso padrão)
+OPERATIONS = {
+    "feed": ("GET /posts/feed", op_feed, 20),
+    "feed_user": ("GET /posts/feed?user_id", op_feed_user, 20),
+    "feed_next_page": ("GET /posts/feed?cursor", op_feed_next_page, 10),
+    "feed_ranked": ("GET /posts/feed?sort", op_feed_ranked, 5),
+    "feed_revalidate": ("GET /posts/feed (304)", op_feed_revalidate, 10),
+    "post_likes": ("GET /likes/post/{id}", op_post_likes, 10),
+    "likes_summary": ("GET /likes/summary", op_likes_summary, 8),
+    "user_posts": ("GET /posts/user/{id}", op_user_posts, 5),
+    "search": ("GET /posts/search", op_search, 5),
+    "toggle_like": ("POST /likes/{id}", op_toggle_like, 8),
+    "like_batch": ("POST /likes/batch", op_like_batch, 1),
+    "create_post": ("POST /posts/", op_create_post, 3),
+}
+
+
+def _random_post(rng, state):
+    return rng.randint(1, state["posts"])
+
+
+def _auth_headers(rng, state):
+    return {"Authorization": f"Bearer {rng.choice(state['tokens'])}"}
+
+
+def issue_tokens(users: int):
+    # Cria as sessões direto no banco, como o /users/login faria depois de conferir a senha
+    from sqlmodel import Session
+    from app import auth
+    from app.db import engine
+
+    tokens = []
+    with Session(engine) as session:
+        for user_id in range(1, min(users, BENCH_TOKEN_USERS) + 1):
+            token, record = auth.new_session(user_id)
+            session.add(record)
+            tokens.append(token)
+        session.commit()
+    return tokens
+
+
+def _remember_feed(state, response):
+    cursor = response.headers.get("x-next-cursor")
+    if cursor:
+        cursors = state["cursors"]
+        cursors.append(cursor)
+        if len(cursors) > FEED_CURSORS_KEPT:
+            del cursors[0]
+
+
+def parse_mix(mix: str):
+    weights = {name: default for name, (_, _, default) in OPERATIONS.items()}
+    if mix:
+        weights = {name: 0 for name in OPERATIONS}
+        for item in mix.split(","):
+            name, _, weight = item.partition("=")
+            if name not in OPERATIONS:
+                raise SystemExit(f"operação desconhecida: {name} (opções: {', '.join(OPERATIONS)})")
+            weights[name] = float(weight or 1)
+    return {name: weight for name, weight in weights.items() if weight > 0}
+
+
+def table_sizes(path: str):
+    connection = sqlite3.connect(path)
+    try:
+        users = connection.execute("SELECT max(id) FROM user").fetchone()[0] or 1
+        posts = connection.execute("SELECT max(id) FROM post").fetchone()[0] or 1
+        likes = connection.execute('SELECT count(*) FROM "like"').fetchone()[0]
+    finally:
+        connection.close()
+    return users, posts, likes
+
+
+async def run_load(app, weights, state, duration, warmup, concurrency, max_requests, seed):
+    import httpx
+
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    names = list(weights)
+    weight_values = [weights[name] for name in names]
+    sent = 0
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        measure_from = started + warmup
+        deadline = measure_from + duration
+
+        async def worker(index):
+            nonlocal sent
+            rng = random.Random(seed + index)
+            while time.perf_counter() < deadline and (max_requests is None or sent < max_requests):
+                name = rng.choices(names, weight_values)[0]
+                route, operation, _ = OPERATIONS[name]
+                begin = time.perf_counter()
+                try:
+                    response = await operation(client, rng, state)
+                    failed = response.status_code >= 400
+                except Exception:
+                    failed = True
+                end = time.perf_counter()
+                if begin >= measure_from:
+                    sent += 1
+                    samples[route].append(end - begin)
+                    if failed:
+                        errors[route] += 1
+
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - max(started, measure_from)
+    return samples, errors, elapsed
+
+
+async def _main(args):
+    os.environ["DATABASE_PATH"] = args.db
+    from app.main import app
+
+    users, posts, likes = table_sizes(args.db)
+    state = {"users": users, "posts": posts, "cursors": [], "feed_etag": None}
+    weights = parse_mix(args.mix)
+
+    async with app.router.lifespan_context(app):
+        # depois do startup, que aplica as migrações (tabela usersession)
+        state["tokens"] = issue_tokens(users)
+        samples, errors, elapsed = await run_load(
+            app, weights, state, args.duration, args.warmup, args.concurrency, args.requests, args.seed
+        )
+
+    result = report.summarize(samples, errors, elapsed)
+    result["meta"] = {
+        "started_at": datetime.utcnow().isoformat(),
+        "db": args.db,
+        "users": users,
+        "posts": posts,
+        "likes": likes,
+        "duration": args.duration,
+        "warmup": args.warmup,
+        "concurrency": args.concurrency,
+        "mix": weights,
+        "seed": args.seed,
+        "async_db": os.getenv("ASYNC_DB", "0") == "1",
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+    }
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Carga mista contra o app, em processo.")
+    parser.add_argument("--db", required=True, help="banco gerado pelo bench.seed")
+    parser.add_argument("--duration", type=float, default=30, help="segundos medidos")
+    parser.add_argument("--warmup", type=float, default=3, help="segundos iniciais descartados")
+    parser.add_argument("--concurrency", type=int, default=16, help="requisições simultâneas")
+    parser.add_argument("--requests", type=int, help="para depois de N requisições medidas")
+    parser.add_argument("--mix", default="", help=f"pesos, ex: feed=5,toggle_like=1 (opções: {', '.join(OPERATIONS)})")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="salva o resultado em JSON")
+    parser.add_argument("--compare", help="JSON de uma execução base para detectar regressões")
+    parser.add_argument("--threshold", type=float, default=0.10, help="piora tolerada na comparação")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        raise SystemExit(f"{args.db} não existe; gere com: python -m bench.seed --db {args.db}")
+
+    result = asyncio.run(_main(args))
+    print(report.format_table(result))
+    if args.out:
+        with open(args.out, "w") as file:
+            json.dump(result, file, indent=2)
+        print(f"Resultado salvo em {args.out}")
+    if args.compare:
+        regressions = report.compare(result, report.load(args.compare), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSÃO {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+'''
+Gera um banco SQLite de rascunho para o benchmark, com inserts em lote (executemany).
+
+Uso (dentro da pasta backend):
+    python -m bench.seed --db /tmp/bench.db --users 100000 --posts 1000000 --likes 10000000
+
+O esquema vem das migrações do app (app/migrations.py) e os contadores likes_count/dislikes_count
+já saem consistentes com a tabela like, e o hot_score já vem calculado. Com a mesma --seed o banco gerado é sempre o mesmo.
+'''
+
+BATCH_SIZE = 50_000
+DISLIKE_RATIO = 0.2
+WORDS = (
+    "hoje amanhã café python código feed post like rede projeto trilha banco dados "
+    "api rápido lento teste carga usuário ótimo ruim bom dia noite música filme jogo"
+).split()
+
+
+def _batches(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _progress(label, done, total, started):
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed if elapsed else 0
+    print(f"\r{label}: {done}/{total} ({rate:,.0f}/s)", end="", file=sys.stderr, flush=True)
+
+
+def create_schema(path: str):
+    # Mesmo esquema do app: aplica as migrações (migrations.py) num banco vazio
+    from app.migrations import migrate
+    from app.ranking import register_functions
+
+    engine = create_engine(f"sqlite:///{path}")
+    event.listen(engine, "connect", lambda dbapi_connection, record: register_functions(dbapi_connection))
+    migrate(engine)
+    engine.dispose()
+
+
+def seed(path: str, users: int, posts: int, likes: int, seed_value: int = 42, search_index: bool = True):
+    if os.path.exists(path):
+        raise SystemExit(f"{path} já existe; use um caminho novo para o banco de benchmark.")
+    rng = random.Random(seed_value)
+    create_schema(path)
+
+    connection = sqlite3.connect(path)
+    # Só para a carga: sem journal e sem fsync, o banco é descartável
+    connection.execute("PRAGMA journal_mode=OFF")
+    connection.execute("PRAGMA synchronous=OFF")
+    # Sem os triggers do FTS durante a carga; o índice de busca é montado de uma vez no final
+    for trigger in ("post_fts_ai", "post_fts_ad", "post_fts_au"):
+        connection.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    connection.execute("DROP TABLE IF EXISTS post_fts")
+
+    started = time.perf_counter()
+    done = 0
+    user_rows = ((f"user{i}", "senha") for i in range(1, users + 1))
+    for batch in _batches(user_rows):
+        connection.executemany("INSERT INTO user (username, password) VALUES (?, ?)", batch)
+        done += len(batch)
+        _progress("users", done, users, started)
+    print(file=sys.stderr)
+
+    # Distribui os likes entre os posts (alguns posts recebem bem mais que outros)
+    weights = [rng.paretovariate(1.5) for _ in range(posts)]
+    scale = likes / sum(weights) if weights else 0
+    like_counts = [min(users, int(weight * scale)) for weight in weights]
+
+    from app.ranking import decayed_score
+
+    now = datetime.utcnow()
+    first_post_at = now - timedelta(days=365)
+    step = timedelta(days=365) / max(posts, 1)
+
+    def post_rows():
+        for i in range(posts):
+            content = " ".join(rng.choices(WORDS, k=rng.randint(5, 30)))
+            created_at = first_post_at + step * i
+            total = like_counts[i]
+            dislikes = int(total * DISLIKE_RATIO)
+            likes = total - dislikes
+            score = decayed_score(likes, dislikes, created_at, now)
+            yield (content, rng.randint(1, users), created_at.isoformat(sep=" "), likes, dislikes, score)
+
+    started = time.perf_counter()
+    done = 0
+    for batch in _batches(post_rows()):
+        connection.executemany(
+            "INSERT INTO post (content, user_id, created_at, likes_count, dislikes_count, hot_score) VALUES (?, ?, ?, ?, ?, ?)",
+            batch,
+        )
+        done += len(batch)
+        _progress("posts", done, posts, started)
+    print(file=sys.stderr)
+
+    now = now.isoformat(sep=" ")
+    total_likes = sum(like_counts)
+
+    def like_rows():
+        for post_id, total in enumerate(like_counts, start=1):
+            dislikes = int(total * DISLIKE_RATIO)
+            for n, user_id in enumerate(rng.sample(range(1, users + 1), total)):
+                yield (user_id, post_id, "DISLIKE" if n < dislikes else "LIKE", now)
+
+    started = time.perf_counter()
+    done = 0
+    for batch in _batches(like_rows()):
+        connection.executemany(
+            'INSERT INTO "like" (user_id, post_id, type, created_at) VALUES (?, ?, ?, ?)',
+            batch,
+        )
+        done += len(batch)
+        _progress("likes", done, total_likes, started)
+    print(file=sys.stderr)
+    if not search_index:
+        # volta o banco para antes da migração do FTS, assim o app cria o índice no startup
+        from app.migrations import MIGRATIONS
+        from app.search import ensure_search_index
+
+        version = next(number for number, _, function in MIGRATIONS if function is ensure_search_index)
+        connection.execute(f"PRAGMA user_version = {version - 1}")
+    connection.commit()
+    connection.close()
+
+    if search_index:
+        from app.search import ensure_search_index
+
+        engine = create_engine(f"sqlite:///{path}")
+        with engine.begin() as conn:
+            ensure_search_index(conn)
+        engine.dispose()
+
+    return {"users": users, "posts": posts, "likes": total_likes}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera um banco SQLite para o benchmark.")
+    parser.add_argument("--db", required=True, help="caminho do banco a ser criado")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--likes", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-search-index", action="store_true", help="não cria o índice FTS5 de busca")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    counts = seed(args.db, args.users, args.posts, args.likes, args.seed, not args.no_search_index)
+    print(f"{counts} em {time.perf_counter() - started:.1f}s -> {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+'''
+Custo por item da serialização das listagens, antes e depois do app/serialization.py.
+
+Para GET /posts/ e GET /posts/feed mede, no mesmo banco:
+    antes     objetos do ORM/Pydantic -> validação do response_model -> json da biblioteca
+              padrão (o mesmo caminho que o FastAPI segue quando a rota devolve os objetos)
+    orjson    colunas -> dicts -> orjson (caminho atual)
+    msgpack   colunas -> dicts -> msgpack (Accept: application/msgpack)
+A query e a serialização são medidas separadas; o resultado é a mediana das repetições,
+em microssegundos por item.
+
+Uso (dentro da pasta backend), depois de gerar o banco com bench.seed:
+    python -m bench.serialization --db /tmp/bench.db --items 5000 --repeat 20
+'''
+
+
+def _timed(function, repeat):
+    # Mediana de `repeat` execuções; devolve (segundos, último resultado)
+    times = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), result
+
+
+def fastapi_json(adapter, objects) -> bytes:
+    # O que o FastAPI faz com response_model: valida, gera os tipos JSON e chama json.dumps
+    value = adapter.validate_python(objects, from_attributes=True)
+    content = adapter.dump_python(value, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def measure(session, items, repeat):
+    from typing import List
+    from pydantic import TypeAdapter
+    from sqlmodel import select
+    from app import serialization
+    from app.models import Post, PostWithLikes
+    from app.routers.posts import feed_page, feed_statement, posts_statement
+
+    posts_adapter = TypeAdapter(List[Post])
+    feed_adapter = TypeAdapter(List[PostWithLikes])
+
+    def load_posts():
+        # Sem o identity map da repetição anterior, como numa requisição nova
+        session.expunge_all()
+        return session.exec(select(Post).limit(items)).all()
+
+    def old_feed_page(rows):
+        return [PostWithLikes(**serialization.summary_dict(row)) for row in rows]
+
+    cases = {
+        "GET /posts/": {
+            "antes": (load_posts, lambda rows: fastapi_json(posts_adapter, rows)),
+            "rows": lambda: serialization.rows_to_dicts(serialization.POST_FIELDS, session.exec(posts_statement().limit(items)).all()),
+        },
+        "GET /posts/feed": {
+            "antes": (lambda: old_feed_page(session.exec(feed_statement(items, None)).all()), lambda posts: fastapi_json(feed_adapter, posts)),
+            "rows": lambda: feed_page(session.exec(feed_statement(items, None)).all(), items)[0],
+        },
+    }
+
+    results = []
+    for route, case in cases.items():
+        load, encode = case["antes"]
+        query_time, objects = _timed(load, repeat)
+        encode_time, body = _timed(lambda: encode(objects), repeat)
+        results.append((route, "antes", len(objects), query_time, encode_time, len(body)))
+
+        query_time, posts = _timed(case["rows"], repeat)
+        for media_type, label in ((serialization.JSON_MEDIA_TYPE, "orjson"), (serialization.MSGPACK_MEDIA_TYPE, "msgpack")):
+            if media_type == serialization.MSGPACK_MEDIA_TYPE and serialization.msgpack is None:
+                continue
+            encode_time, body = _timed(lambda: serialization.encode(posts, media_type), repeat)
+            results.append((route, label, len(posts), query_time, encode_time, len(body)))
+    return results
+
+
+def format_table(results) -> str:
+    lines = [f"{'rota':<18}{'caminho':<10}{'itens':>7}{'query µs':>11}{'serial. µs':>12}{'total µs':>10}{'bytes/item':>12}"]
+    for route, label, count, query_time, encode_time, size in results:
+        count = max(count, 1)
+        lines.append(
+            f"{route:<18}{label:<10}{count:>7}"
+            f"{query_time / count * 1e6:>11.2f}{encode_time / count * 1e6:>12.2f}"
+            f"{(query_time + encode_time) / count * 1e6:>10.2f}{size / count:>12.1f}"
+        )
+    lines.append("(µs por item, mediana das repetições)")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Custo por item da serialização das listagens.")
+    parser.add_argument("--db", required=True, help="banco gerado pelo bench.seed")
+    parser.add_argument("--items", type=int, default=5000, help="posts por resposta (o feed usa o mesmo valor como limit)")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        raise SystemExit(f"{args.db} não existe; gere com: python -m bench.seed --db {args.db}")
+    os.environ["DATABASE_PATH"] = args.db
+    from sqlmodel import Session
+    from app.db import read_engine
+
+    with Session(read_engine) as session:
+        print(format_table(measure(session, args.items, args.repeat)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+import atexit
+import itertools
+import os
+import shutil
+import tempfile
+'''
+Configuração dos testes (precisa do pytest, ver requirements.txt).
+
+Uso (dentro da pasta backend):
+    python -m pytest
+
+O DATABASE_PATH, o UPLOADS_DIR e o MEDIA_DIR são lidos no import do app, então o banco e as
+pastas temporárias são definidos aqui, antes de qualquer import do app.
+O refresher do hot_score fica desligado para os testes não dependerem do relógio.
+'''
+
+_tmp = tempfile.mkdtemp(prefix="rede-tests-")
+atexit.register(shutil.rmtree, _tmp, ignore_errors=True)
+os.environ["DATABASE_PATH"] = os.path.join(_tmp, "rede.db")
+os.environ["UPLOADS_DIR"] = os.path.join(_tmp, "uploads")
+os.environ["MEDIA_DIR"] = os.path.join(_tmp, "media")
+os.environ["HOT_REFRESH_SECONDS"] = "0"
+
+import pytest
+from fastapi.testclient import TestClient
+
+_usernames = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def client():
+    # o with roda o lifespan: aplica as migrações no banco temporário
+    from app.main import app
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def new_user(client):
+    # Cadastra um usuário novo e devolve o header com o token dele
+    def register():
+        credentials = {"username": f"teste{next(_usernames)}", "password": "senha123"}
+        assert client.post("/users/register", json=credentials).status_code == 200
+        token = client.post("/users/login", json=credentials).json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+    return register
+
+
+@pytest.fixture
+def auth_headers(new_user):
+    return new_user()
+
+
+@pytest.fixture
+def create_post(client, auth_headers):
+    def create(content: str = "post de teste", headers=None):
+        response = client.post("/posts/", json={"content": content}, headers=headers or auth_headers)
+        assert response.status_code == 200
+        return response.json()
+    return create
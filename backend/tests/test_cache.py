@@ -0,0 +1,84 @@
+import pytest
+from app import cache
+'''
+Cache das leituras e ETag/304 (cache.py): If-None-Match com o ETag atual dá 304, toda
+escrita invalida, o ETag muda por usuário e por formato, e um ETag de antes de reiniciar
+o processo não vale depois, mesmo com a versão de volta no mesmo número.
+'''
+
+READS = ["/posts/feed", "/posts/feed?sort=top", "/likes/summary?post_ids={post_id}", "/likes/post/{post_id}"]
+
+
+def revalidate(client, path, etag, **headers):
+    return client.get(path, headers={"If-None-Match": etag, **headers})
+
+
+@pytest.fixture
+def post_id(create_post):
+    return create_post("post do cache")["id"]
+
+
+@pytest.mark.parametrize("path", READS)
+def test_not_modified(client, post_id, path):
+    path = path.format(post_id=post_id)
+    response = client.get(path)
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "no-cache"
+
+    cached = revalidate(client, path, etag)
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+    assert revalidate(client, path, f'W/"outro", {etag}').status_code == 304
+    assert revalidate(client, path, "*").status_code == 304
+
+
+@pytest.mark.parametrize("path", READS)
+def test_write_invalidates(client, auth_headers, post_id, path):
+    path = path.format(post_id=post_id)
+    etag = client.get(path).headers["etag"]
+    client.post(f"/likes/{post_id}", json={"post_id": post_id, "type": "like"}, headers=auth_headers)
+
+    response = revalidate(client, path, etag)
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    body = response.json()
+    post = next(post for post in (body if isinstance(body, list) else [body]) if post["id"] == post_id)
+    assert post["likes_count"] == 1
+
+
+def test_etag_per_user_and_format(client, post_id):
+    path = f"/likes/post/{post_id}"
+    anonymous = client.get(path).headers["etag"]
+    assert client.get(path, params={"user_id": 1}).headers["etag"] != anonymous
+    assert revalidate(client, f"{path}?user_id=1", anonymous).status_code == 200
+    msgpack = client.get(path, headers={"Accept": "application/msgpack"})
+    assert msgpack.headers["etag"] != anonymous
+    assert revalidate(client, path, msgpack.headers["etag"]).status_code == 200
+
+
+def test_feed_page_from_cache(client, create_post):
+    client.get("/posts/feed")
+    hits = cache.feed_cache.hits
+    first = client.get("/posts/feed").json()
+    assert cache.feed_cache.hits > hits
+    post = create_post("depois do cache")
+    assert client.get("/posts/feed").json()[0]["id"] == post["id"] != first[0]["id"]
+
+
+def test_etag_after_restart(client, create_post, monkeypatch):
+    # Um processo novo começa com a versão 0 e o cache vazio; quando a versão volta ao
+    # número do ETag antigo, o conteúdo já é outro e o ETag antigo não pode dar 304
+    etag = client.get("/posts/feed").headers["etag"]
+    version = cache._version
+
+    monkeypatch.setattr(cache, "BOOT_ID", "reiniciado")
+    monkeypatch.setattr(cache, "_version", 0)
+    cache.feed_cache.clear()
+    post = create_post("escrito depois de reiniciar")
+    monkeypatch.setattr(cache, "_version", version)
+
+    response = revalidate(client, "/posts/feed", etag)
+    assert response.status_code == 200
+    assert response.json()[0]["id"] == post["id"]
+    assert revalidate(client, "/posts/feed", response.headers["etag"]).status_code == 304
@@ -0,0 +1,133 @@
+import sqlite3
+import pytest
+from app import auth, cache, coherence
+from app.coherence import SharedLog
+from app.db import DATABASE_PATH, engine
+'''
+Log compartilhado entre os workers (coherence.py). O "outro worker" é uma conexão sqlite3
+própria com os TEMP TRIGGERs instalados, como as conexões de escrita do app.serve: o que
+ela muda chega a este processo só pelo log.
+
+Os testes do SharedLog usam instâncias próprias; os de ponta a ponta ligam o log global,
+com outro BOOT_ID para os ETags de agora não se confundirem com os dos outros testes.
+'''
+
+
+@pytest.fixture
+def other_worker():
+    connection = sqlite3.connect(DATABASE_PATH, isolation_level=None)
+    coherence.install_triggers(connection)
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def worker_log():
+    # Um SharedLog novo, que registra o que os handlers recebem
+    log = SharedLog(True)
+    log.changes, log.reset_calls, log.versions = [], [], []
+    for kind in ("post_created", "post_updated", "post_deleted", "reaction", "session", "ranking"):
+        log.on(kind, log.changes.append)
+    log.on_reset(lambda: log.reset_calls.append(log.version))
+    log.on_version(lambda latest: log.versions.append(dict(latest)))
+    log.sync()
+    return log
+
+
+def append_rows(connection, *kinds):
+    for kind in kinds:
+        connection.execute("INSERT INTO cacheinvalidation (kind, post_id) VALUES (?, 1)", (kind,))
+
+
+def test_changes_applied_in_order(worker_log, other_worker, create_post):
+    post_id = create_post("post do outro worker")["id"]
+    start = worker_log.version
+    other_worker.execute("UPDATE post SET content = 'editado no outro worker' WHERE id = ?", (post_id,))
+    other_worker.execute("DELETE FROM post WHERE id = ?", (post_id,))
+
+    assert worker_log.sync() == start + 2
+    assert [(change.kind, change.post_id) for change in worker_log.changes] == [
+        ("post_updated", post_id), ("post_deleted", post_id),
+    ]
+    assert worker_log.latest["post_deleted"] == start + 2
+    assert worker_log.versions[-1] == worker_log.latest
+    assert worker_log.reset_calls == []
+    # sem commit novo o sync não lê o log
+    assert worker_log.sync() == start + 2
+    assert len(worker_log.changes) == 2
+
+
+def test_first_sync_skips_old_rows(other_worker):
+    append_rows(other_worker, "reaction", "ranking")
+    log = SharedLog(True)
+    changes = []
+    log.on("reaction", changes.append)
+    last = log.sync()
+    assert changes == []
+    assert log.latest["ranking"] == last
+    assert log.latest["reaction"] == last - 1
+
+
+def test_gap_at_start_resets(worker_log, other_worker, monkeypatch):
+    start = worker_log.version
+    append_rows(other_worker, "reaction", "reaction", "reaction")
+    monkeypatch.setattr(coherence, "COHERENCE_LOG_KEEP", 1)
+    worker_log.prune(engine)
+
+    assert worker_log.sync() == start + 3
+    assert worker_log.reset_calls == [start]
+    assert worker_log.changes == []
+
+
+def test_gap_after_retained_row_resets(worker_log, other_worker, monkeypatch):
+    # A poda mantém a última linha de cada kind: aqui a primeira linha depois da versão do
+    # worker sobrevive, e o buraco fica no meio
+    start = worker_log.version
+    append_rows(other_worker, "ranking", "reaction", "reaction", "reaction", "reaction", "reaction")
+    monkeypatch.setattr(coherence, "COHERENCE_LOG_KEEP", 1)
+    worker_log.prune(engine)
+    with engine.connect() as connection:
+        ids = [row[0] for row in connection.exec_driver_sql("SELECT id FROM cacheinvalidation WHERE id > ?", (start,))]
+    assert ids == [start + 1, start + 6]
+
+    assert worker_log.sync() == start + 6
+    assert worker_log.reset_calls == [start]
+    assert worker_log.changes == []
+    assert worker_log.latest["ranking"] == start + 1
+    assert worker_log.latest["reaction"] == start + 6
+    assert worker_log.resets == 1
+
+
+@pytest.fixture
+def shared_log(monkeypatch):
+    # Liga o log global deste processo, como num worker do app.serve
+    monkeypatch.setattr(cache, "BOOT_ID", "log-compartilhado")
+    monkeypatch.setattr(cache, "_version", cache._version)
+    monkeypatch.setattr(cache, "_ranking_version", cache._ranking_version)
+    monkeypatch.setattr(coherence.log, "enabled", True)
+    coherence.log.sync()
+    yield coherence.log
+    cache.feed_cache.clear()
+
+
+def test_write_in_other_worker_invalidates_feed(client, create_post, shared_log, other_worker):
+    post_id = create_post("post em cache")["id"]
+    first = client.get("/posts/feed")
+    etag = first.headers["etag"]
+    assert client.get("/posts/feed", headers={"If-None-Match": etag}).status_code == 304
+
+    other_worker.execute("UPDATE post SET content = 'editado no outro worker' WHERE id = ?", (post_id,))
+    response = client.get("/posts/feed", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    post = next(post for post in response.json() if post["id"] == post_id)
+    assert post["content"] == "editado no outro worker"
+
+
+def test_logout_in_other_worker(client, auth_headers, shared_log, other_worker):
+    token = auth_headers["Authorization"].split()[1]
+    assert client.get("/users/me", headers=auth_headers).status_code == 200
+    assert auth.session_cache.get(auth.token_digest(token)) is not cache.MISSING
+
+    other_worker.execute("DELETE FROM usersession WHERE token_hash = ?", (auth.token_digest(token),))
+    assert client.get("/users/me", headers=auth_headers).status_code == 401
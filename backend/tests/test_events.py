@@ -0,0 +1,97 @@
+import asyncio
+import json
+import pytest
+from app import events
+'''
+Eventos do GET /posts/stream (events.py): criar, editar e apagar post viram eventos na
+hora, as reações de um intervalo saem num reaction_counts só por post, e um cliente que
+deixou a fila encher recebe resync.
+
+O stream não termina, então os testes leem o gerador event_stream() direto, no event loop
+do TestClient (client.portal), que é o loop onde o bus foi iniciado pelo lifespan.
+'''
+
+TIMEOUT = 5
+
+
+def parse(message: str):
+    lines = dict(line.split(": ", 1) for line in message.strip().splitlines())
+    return lines["event"], json.loads(lines["data"])
+
+
+@pytest.fixture
+def stream(client):
+    # Gerador já inscrito no bus (o primeiro item é o "retry:")
+    generator = events.event_stream()
+    assert client.portal.call(generator.__anext__).startswith("retry:")
+    yield generator
+    client.portal.call(generator.aclose)
+
+
+def next_event(client, stream):
+    async def read():
+        return await asyncio.wait_for(stream.__anext__(), TIMEOUT)
+    return parse(client.portal.call(read))
+
+
+def test_route_headers(client):
+    route = next(route for route in client.app.routes if getattr(route, "path", None) == "/posts/stream")
+    response = client.portal.call(route.endpoint)
+    assert response.media_type == "text/event-stream"
+    assert response.headers["cache-control"] == "no-cache"
+    client.portal.call(response.body_iterator.aclose)
+
+
+def test_post_events(client, stream, auth_headers, create_post):
+    post = create_post("post ao vivo")
+    assert next_event(client, stream) == ("post_created", post)
+
+    client.put(f"/posts/{post['id']}", json={"content": "post editado"}, headers=auth_headers)
+    event, data = next_event(client, stream)
+    assert (event, data["id"], data["content"]) == ("post_updated", post["id"], "post editado")
+
+    client.delete(f"/posts/{post['id']}", headers=auth_headers)
+    assert next_event(client, stream) == ("post_deleted", {"id": post["id"]})
+
+
+def test_reaction_counts(client, stream, new_user, create_post):
+    post_id = create_post("post com reações")["id"]
+    assert next_event(client, stream)[0] == "post_created"
+    for _ in range(3):
+        client.post(f"/likes/{post_id}", json={"post_id": post_id, "type": "like"}, headers=new_user())
+    client.post(f"/likes/{post_id}", json={"post_id": post_id, "type": "dislike"}, headers=new_user())
+
+    # as reações podem cair em mais de um intervalo, mas os contadores chegam ao total
+    counts = None
+    while counts != (3, 1):
+        event, data = next_event(client, stream)
+        assert (event, data["post_id"]) == ("reaction_counts", post_id)
+        counts = (data["likes_count"], data["dislikes_count"])
+
+
+def test_reactions_coalesced(client, stream, create_post):
+    post_id = create_post("post disputado")["id"]
+    assert next_event(client, stream)[0] == "post_created"
+    published = events.bus.published
+    for _ in range(50):
+        events.bus.publish_reaction(post_id)
+    event, data = next_event(client, stream)
+    assert (event, data["post_id"]) == ("reaction_counts", post_id)
+    # espera mais dois intervalos: nenhum outro evento saiu
+    client.portal.call(asyncio.sleep, events.EVENTS_COALESCE_SECONDS * 2)
+    assert events.bus.published == published + 1
+
+
+def test_slow_client_resync(client, create_post, monkeypatch):
+    monkeypatch.setattr(events, "EVENTS_QUEUE_SIZE", 1)
+    generator = events.event_stream()
+    client.portal.call(generator.__anext__)
+    lagged = events.bus.lagged
+    first = create_post("primeiro")
+    create_post("segundo")
+    create_post("terceiro")
+    assert next_event(client, generator) == ("post_created", first)
+    assert next_event(client, generator) == ("resync", {})
+    assert events.bus.lagged == lagged + 1
+    client.portal.call(generator.aclose)
+    assert events.bus.stats()["subscribers"] == 0
@@ -0,0 +1,108 @@
+import base64
+import pytest
+from app import cache
+from app.db import engine
+from app.routers.posts import FeedSort, feed_statement
+'''
+Paginação por cursor do GET /posts/feed (header X-Next-Cursor) nas três ordenações,
+cursores malformados ou fora da faixa do SQLite (400) e a invalidação do cache das páginas quando o hot_score é recalculado.
+'''
+
+
+def read_feed(client, sort: str, limit: int):
+    # Segue o X-Next-Cursor até a última página e devolve os ids na ordem recebida
+    ids, cursor, pages = [], None, 0
+    while True:
+        params = {"sort": sort, "limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/posts/feed", params=params)
+        assert response.status_code == 200
+        ids += [post["id"] for post in response.json()]
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return ids, pages
+
+
+def expected_order(sort: FeedSort):
+    # A mesma query do feed, sem limite de página
+    with engine.connect() as connection:
+        return [row.id for row in connection.execute(feed_statement(10**6, None, sort))]
+
+
+@pytest.fixture(scope="module")
+def posts(client, new_user):
+    # Posts com saldos repetidos, para a paginação depender do desempate pelo id
+    author = new_user()
+    ids = [client.post("/posts/", json={"content": f"feed {i}"}, headers=author).json()["id"] for i in range(8)]
+    voters = [new_user() for _ in range(3)]
+    for post_id, likes, dislikes in [(ids[1], 2, 0), (ids[3], 2, 0), (ids[4], 0, 1), (ids[6], 3, 0)]:
+        for headers, like_type in zip(voters, ["like"] * likes + ["dislike"] * dislikes):
+            client.post(f"/likes/{post_id}", json={"post_id": post_id, "type": like_type}, headers=headers)
+    return ids
+
+
+@pytest.mark.parametrize("sort", list(FeedSort), ids=[sort.value for sort in FeedSort])
+@pytest.mark.parametrize("limit", [1, 3, 100])
+def test_cursor_pagination(client, posts, sort, limit):
+    ids, pages = read_feed(client, sort.value, limit)
+    assert len(ids) == len(set(ids))
+    assert set(posts) <= set(ids)
+    assert ids == expected_order(sort)
+    assert pages == len(ids) // limit + 1
+
+
+def test_top_order(client, posts):
+    feed = client.get("/posts/feed", params={"sort": "top", "limit": 100}).json()
+    scores = [post["likes_count"] - post["dislikes_count"] for post in feed]
+    assert scores == sorted(scores, reverse=True)
+    assert feed[0]["id"] == posts[6]
+
+
+def raw_cursor(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+@pytest.mark.parametrize("sort, cursor", [
+    pytest.param("new", "inválido", id="not-base64"),
+    pytest.param("new", raw_cursor("2024-01-01T00:00:00"), id="missing-id"),
+    pytest.param("new", raw_cursor("ontem|1"), id="bad-date"),
+    pytest.param("new", raw_cursor(f"2024-01-01T00:00:00|{2**63}"), id="id-overflow"),
+    pytest.param("top", raw_cursor("1.5|1"), id="top-float"),
+    pytest.param("top", raw_cursor(f"{2**63}|1"), id="top-overflow"),
+    pytest.param("top", raw_cursor(f"{-2**63 - 1}|1"), id="top-underflow"),
+    pytest.param("top", raw_cursor(f"1|{2**63}"), id="top-id-overflow"),
+    pytest.param("hot", raw_cursor("nan|1"), id="hot-nan"),
+    pytest.param("hot", raw_cursor("inf|1"), id="hot-inf"),
+    pytest.param("hot", raw_cursor("-inf|1"), id="hot-minus-inf"),
+    pytest.param("hot", raw_cursor(f"1.0|{-2**63 - 1}"), id="hot-id-underflow"),
+    pytest.param("hot", raw_cursor("1.0|1|2"), id="extra-field"),
+])
+def test_invalid_cursor(client, sort, cursor):
+    assert client.get("/posts/feed", params={"sort": sort, "cursor": cursor}).status_code == 400
+
+
+@pytest.mark.parametrize("sort, cursor", [
+    pytest.param("top", raw_cursor(f"{2**63 - 1}|{2**63 - 1}"), id="top-max"),
+    pytest.param("top", raw_cursor(f"{-2**63}|1"), id="top-min"),
+    pytest.param("hot", raw_cursor("1e308|1"), id="hot-large"),
+])
+def test_cursor_at_integer_limits(client, sort, cursor):
+    assert client.get("/posts/feed", params={"sort": sort, "cursor": cursor}).status_code == 200
+
+
+def test_new_post_invalidates_first_page(client, posts, create_post):
+    client.get("/posts/feed")  # primeira página no cache
+    post_id = create_post()["id"]
+    assert client.get("/posts/feed").json()[0]["id"] == post_id
+
+
+def test_score_refresh_only_invalidates_hot_pages(client, posts):
+    etags = {sort: client.get("/posts/feed", params={"sort": sort}).headers["etag"] for sort in ("new", "top", "hot")}
+    cache.on_scores_refreshed()
+    status = {
+        sort: client.get("/posts/feed", params={"sort": sort}, headers={"If-None-Match": etag}).status_code
+        for sort, etag in etags.items()
+    }
+    assert status == {"new": 304, "top": 304, "hot": 200}
@@ -0,0 +1,169 @@
+from datetime import datetime
+from sqlalchemy import event
+import pytest
+from app.db import engine
+from app.models import SQLITE_MAX_INT, LikeType
+from app.reconcile import find_drift
+from app.routers import likes
+from app.routers.likes import toggle_outcome
+'''
+Toggle de like/dislike (POST /likes/{id} e /likes/batch) e a conta dos contadores
+desnormalizados likes_count/dislikes_count, conferida contra a tabela like (reconcile.py).
+'''
+
+
+def counts(client, post_id):
+    summary = client.get(f"/likes/post/{post_id}").json()
+    return summary["likes_count"], summary["dislikes_count"]
+
+
+def toggle(client, headers, post_id, like_type):
+    return client.post(f"/likes/{post_id}", json={"post_id": post_id, "type": like_type}, headers=headers)
+
+
+def batch(client, headers, *reactions):
+    body = {"reactions": [{"post_id": post_id, "type": like_type} for post_id, like_type in reactions]}
+    response = client.post("/likes/batch", json=body, headers=headers)
+    assert response.status_code == 200
+    return [result["action"] for result in response.json()["results"]]
+
+
+def assert_no_drift():
+    with engine.connect() as connection:
+        assert find_drift(connection) == []
+
+
+@pytest.mark.parametrize("like_type, action, expected", [
+    (LikeType.LIKE, "added", ("added", 1, 0)),
+    (LikeType.DISLIKE, "added", ("added", 0, 1)),
+    (LikeType.LIKE, "removed", ("removed", -1, 0)),
+    (LikeType.DISLIKE, "removed", ("removed", 0, -1)),
+    (LikeType.LIKE, "switched", ("switched", 1, -1)),
+    (LikeType.DISLIKE, "switched", ("switched", -1, 1)),
+    (LikeType.LIKE, None, (None, 0, 0)),
+])
+def test_toggle_outcome(like_type, action, expected):
+    assert toggle_outcome(like_type, action) == expected
+
+
+def test_toggle_add_switch_remove(client, auth_headers, create_post):
+    post_id = create_post()["id"]
+
+    assert toggle(client, auth_headers, post_id, "like").status_code == 200
+    assert counts(client, post_id) == (1, 0)
+    assert toggle(client, auth_headers, post_id, "dislike").status_code == 200
+    assert counts(client, post_id) == (0, 1)
+    assert toggle(client, auth_headers, post_id, "dislike").status_code == 200
+    assert counts(client, post_id) == (0, 0)
+    assert_no_drift()
+
+
+def test_toggle_missing_post(client, auth_headers):
+    assert toggle(client, auth_headers, SQLITE_MAX_INT, "like").status_code == 404
+
+
+def test_batch_counters(client, auth_headers, create_post):
+    first, second = create_post()["id"], create_post()["id"]
+
+    actions = batch(
+        client, auth_headers,
+        (first, "like"), (first, "dislike"),
+        (second, "like"), (second, "like"), (second, "dislike"),
+        (SQLITE_MAX_INT, "like"),
+    )
+    assert actions == ["added", "switched", "added", "removed", "added", "not_found"]
+    assert counts(client, first) == (0, 1)
+    assert counts(client, second) == (0, 1)
+    assert_no_drift()
+
+
+def like_rows(post_id):
+    with engine.connect() as connection:
+        return connection.exec_driver_sql(
+            "SELECT id, type, created_at FROM \"like\" WHERE post_id = ? ORDER BY id", (post_id,)
+        ).all()
+
+
+def test_batch_same_timestamp(client, auth_headers, create_post, monkeypatch):
+    # Com o relógio parado todas as reações do lote têm o mesmo created_at:
+    # o toggle não pode depender do horário para saber qual reação é a atual.
+    # As rotas async (ASYNC_DB=1) rodam o mesmo likes.toggle_reactions pelo run_sync,
+    # então o relógio do likes.py vale nos dois modos (o created_at gravado confere)
+    frozen = datetime(2024, 1, 1, 12, 0, 0)
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def utcnow(cls):
+            return frozen
+
+    monkeypatch.setattr(likes, "datetime", FrozenDatetime)
+    post_id = create_post()["id"]
+
+    actions = batch(client, auth_headers, (post_id, "like"), (post_id, "dislike"), (post_id, "like"))
+    assert actions == ["added", "switched", "switched"]
+    assert counts(client, post_id) == (1, 0)
+    assert [datetime.fromisoformat(row.created_at) for row in like_rows(post_id)] == [frozen]
+    assert_no_drift()
+
+
+def test_switch_keeps_reaction_row(client, auth_headers, create_post):
+    post_id = create_post()["id"]
+    toggle(client, auth_headers, post_id, "like")
+    (like_id, _, created_at), = like_rows(post_id)
+    toggle(client, auth_headers, post_id, "dislike")
+    assert like_rows(post_id) == [(like_id, "DISLIKE", created_at)]
+
+
+def count_statements(action):
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine.__class__, "after_cursor_execute", listener)
+    try:
+        action()
+    finally:
+        event.remove(engine.__class__, "after_cursor_execute", listener)
+    return len(statements)
+
+
+def test_batch_statement_count(client, auth_headers, create_post):
+    # O lote tem um número fixo de statements, qualquer que seja o tamanho (nada de N+1)
+    ids = [create_post()["id"] for _ in range(21)]
+    batch(client, auth_headers, (ids[0], "like"))  # sessão do token já no cache
+    small = count_statements(lambda: batch(client, auth_headers, (ids[1], "like")))
+    large = count_statements(lambda: batch(client, auth_headers, *[(post_id, "dislike") for post_id in ids[:20]], (ids[20], "like")))
+    assert small == large <= 6
+    assert_no_drift()
+
+
+def test_reactions_of_several_users(client, auth_headers, new_user, create_post):
+    post_id = create_post()["id"]
+    other = new_user()
+
+    batch(client, auth_headers, (post_id, "like"))
+    batch(client, other, (post_id, "dislike"))
+    assert counts(client, post_id) == (1, 1)
+    batch(client, other, (post_id, "like"))
+    assert counts(client, post_id) == (2, 0)
+    assert_no_drift()
+
+
+@pytest.mark.parametrize("post_id", [0, -1, SQLITE_MAX_INT + 1])
+def test_batch_rejects_invalid_ids(client, auth_headers, post_id):
+    response = client.post("/likes/batch", json={"reactions": [{"post_id": post_id, "type": "like"}]}, headers=auth_headers)
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("post_id", [0, SQLITE_MAX_INT + 1])
+def test_toggle_rejects_invalid_ids(client, auth_headers, post_id):
+    assert toggle(client, auth_headers, post_id, "like").status_code == 422
+
+
+def test_batch_limit(client, auth_headers):
+    reactions = [(1, "like")] * (likes.LIKE_BATCH_MAX + 1)
+    body = {"reactions": [{"post_id": post_id, "type": like_type} for post_id, like_type in reactions]}
+    assert client.post("/likes/batch", json=body, headers=auth_headers).status_code == 400
+
+
+@pytest.mark.parametrize("post_ids", ["0", "-1", str(SQLITE_MAX_INT + 1), "1,abc", ","])
+def test_summary_rejects_invalid_ids(client, post_ids):
+    assert client.get("/likes/summary", params={"post_ids": post_ids}).status_code == 400
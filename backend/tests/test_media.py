@@ -0,0 +1,78 @@
+import hashlib
+import os
+from app import media
+'''
+Upload e download das mídias (media.py e routers/media.py): o arquivo é salvo pelo sha256,
+sai só por GET /media/{name} com Cache-Control immutable (nunca pelo /uploads) e nenhum
+.part fica para trás, nem quando o upload é recusado.
+'''
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"conteudo de teste"
+
+
+def upload(client, post_id, headers, data=PNG, content_type="image/png"):
+    return client.post(f"/posts/{post_id}/media", files={"file": ("foto.png", data, content_type)}, headers=headers)
+
+
+def part_files():
+    return [name for _, _, names in os.walk(media.MEDIA_DIR) for name in names if name.endswith(".part")]
+
+
+def test_upload_and_download(client, auth_headers, create_post):
+    post_id = create_post()["id"]
+    response = upload(client, post_id, auth_headers)
+    assert response.status_code == 200
+    info = response.json()["media"]
+    digest = hashlib.sha256(PNG).hexdigest()
+    assert info["sha256"] == digest
+    assert info["url"] == f"/media/{digest}.png"
+    assert response.json()["post"]["image_url"] == info["url"]
+
+    download = client.get(info["url"])
+    assert download.status_code == 200
+    assert download.content == PNG
+    assert download.headers["cache-control"] == media.MEDIA_CACHE_CONTROL
+    assert client.get(info["url"], headers={"If-None-Match": download.headers["etag"]}).status_code == 304
+    assert part_files() == []
+
+
+def test_media_not_under_uploads(client, auth_headers, create_post):
+    name = upload(client, create_post()["id"], auth_headers).json()["media"]["url"].rsplit("/", 1)[1]
+    assert not os.path.abspath(media.MEDIA_DIR).startswith(os.path.abspath(media.UPLOADS_DIR) + os.sep)
+    assert client.get(f"/uploads/media/{name[:2]}/{name}").status_code == 404
+
+
+def test_deduplicated(client, auth_headers, create_post):
+    data = PNG + b" dedup"
+    first = upload(client, create_post()["id"], auth_headers, data).json()["media"]
+    second = upload(client, create_post()["id"], auth_headers, data).json()["media"]
+    assert second["url"] == first["url"]
+    assert second["deduplicated"]
+
+
+def test_rejected_uploads(client, auth_headers, new_user, create_post, monkeypatch):
+    post_id = create_post()["id"]
+    assert upload(client, post_id, {}).status_code == 401
+    assert upload(client, post_id, new_user()).status_code == 403
+    assert upload(client, 10**9, auth_headers).status_code == 404
+    assert upload(client, post_id, auth_headers, content_type="text/plain").status_code == 415
+    monkeypatch.setattr(media, "MEDIA_MAX_BYTES", 4)
+    assert upload(client, post_id, auth_headers).status_code == 413
+    assert part_files() == []
+
+
+def test_invalid_name(client):
+    assert client.get("/media/..%2F..%2Frede.db").status_code == 404
+    assert client.get(f"/media/{'0' * 64}.png").status_code == 404
+
+
+def test_move_legacy_media(tmp_path, monkeypatch):
+    legacy = tmp_path / "uploads" / "media"
+    (legacy / "ab").mkdir(parents=True)
+    (legacy / "ab" / "abc.png").write_bytes(PNG)
+    monkeypatch.setattr(media, "LEGACY_MEDIA_DIR", str(legacy))
+    monkeypatch.setattr(media, "MEDIA_DIR", str(tmp_path / "media"))
+    media.move_legacy_media()
+    assert not legacy.exists()
+    assert (tmp_path / "media" / "ab" / "abc.png").read_bytes() == PNG
+    media.move_legacy_media()  # sem pasta antiga não faz nada
@@ -0,0 +1,157 @@
+import pytest
+from sqlalchemy import create_engine, event, inspect
+from sqlmodel import SQLModel
+from app import migrations
+from app.db import set_sqlite_pragmas
+from app.migrations import LATEST_VERSION, apply_migration, current_version, migrate, pending_migrations
+'''
+Migrações versionadas (migrations.py): banco novo, rede.db antigo do create_all,
+atomicidade de cada migração com o seu user_version e o esquema final (igual nos dois
+caminhos e com tudo o que os models declaram). Cada teste usa um arquivo próprio.
+'''
+
+# Esquema do rede.db criado pelo create_all antes das migrações (sem contadores, hot_score nem índices)
+LEGACY_SCHEMA = [
+    "CREATE TABLE user (id INTEGER NOT NULL, username VARCHAR NOT NULL, password VARCHAR NOT NULL, PRIMARY KEY (id))",
+    "CREATE UNIQUE INDEX ix_user_username ON user (username)",
+    """CREATE TABLE post (id INTEGER NOT NULL, content VARCHAR NOT NULL, image_url VARCHAR, video_url VARCHAR,
+        user_id INTEGER NOT NULL, created_at DATETIME NOT NULL, updated_at DATETIME,
+        PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES user (id))""",
+    """CREATE TABLE "like" (id INTEGER NOT NULL, user_id INTEGER NOT NULL, post_id INTEGER NOT NULL,
+        type VARCHAR(7) NOT NULL, created_at DATETIME NOT NULL, PRIMARY KEY (id),
+        CONSTRAINT unique_user_post_like UNIQUE (user_id, post_id),
+        FOREIGN KEY(user_id) REFERENCES user (id), FOREIGN KEY(post_id) REFERENCES post (id))""",
+]
+
+
+def make_engine(path):
+    engine = create_engine(f"sqlite:///{path}")
+    event.listen(engine, "connect", lambda dbapi_connection, record: set_sqlite_pragmas(dbapi_connection))
+    return engine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = make_engine(tmp_path / "rede.db")
+    yield engine
+    engine.dispose()
+
+
+def create_legacy(engine):
+    with engine.begin() as connection:
+        for statement in LEGACY_SCHEMA:
+            connection.exec_driver_sql(statement)
+
+
+def schema(engine):
+    # {tabela: (colunas, índices, foreign keys)}, sem depender da ordem das colunas; os índices
+    # vêm do PRAGMA index_list, que também lista os de expressão e os das constraints UNIQUE
+    inspector = inspect(engine)
+    tables = {}
+    with engine.connect() as connection:
+        for table in inspector.get_table_names():
+            indexes = set()
+            for _, name, unique, origin, _ in connection.exec_driver_sql(f'PRAGMA index_list("{table}")'):
+                columns = tuple(row[2] for row in connection.exec_driver_sql(f'PRAGMA index_info("{name}")'))
+                # os índices das constraints têm nome automático (sqlite_autoindex_...)
+                indexes.add((name if origin == "c" else origin, columns, bool(unique)))
+            tables[table] = (
+                {(c["name"], str(c["type"]).split("(")[0], c["nullable"]) for c in inspector.get_columns(table)},
+                indexes,
+                {(tuple(f["constrained_columns"]), f["referred_table"]) for f in inspector.get_foreign_keys(table)},
+            )
+    return tables
+
+
+def version_of(engine) -> int:
+    with engine.connect() as connection:
+        return current_version(connection)
+
+
+def post_columns(engine):
+    return {column["name"] for column in inspect(engine).get_columns("post")}
+
+
+def test_fresh_database(engine):
+    assert migrate(engine) == LATEST_VERSION
+    assert version_of(engine) == LATEST_VERSION
+    assert {"user", "post", "like", "usersession", "cacheinvalidation", "post_fts"} <= set(inspect(engine).get_table_names())
+    with engine.connect() as connection:
+        assert pending_migrations(connection) == []
+    # rodar de novo não faz nada
+    assert migrate(engine) == LATEST_VERSION
+
+
+def test_legacy_database(engine):
+    create_legacy(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO user VALUES (1, 'ana', 'x'), (2, 'bia', 'x'), (3, 'caio', 'x')")
+        connection.exec_driver_sql("INSERT INTO post VALUES (1, 'post antigo', NULL, NULL, 1, '2024-01-01 12:00:00', NULL)")
+        connection.exec_driver_sql(
+            "INSERT INTO \"like\" VALUES (1, 1, 1, 'LIKE', '2024-01-01 12:00:00'), "
+            "(2, 2, 1, 'LIKE', '2024-01-01 12:00:00'), (3, 3, 1, 'DISLIKE', '2024-01-01 12:00:00')"
+        )
+
+    assert migrate(engine) == LATEST_VERSION
+    assert {"likes_count", "dislikes_count", "hot_score"} <= post_columns(engine)
+    with engine.connect() as connection:
+        row = connection.exec_driver_sql("SELECT content, likes_count, dislikes_count, hot_score FROM post").one()
+        assert tuple(row[:3]) == ("post antigo", 2, 1)
+        assert row.hot_score > 0
+        # o índice de busca inclui os posts que já existiam
+        assert connection.exec_driver_sql("SELECT rowid FROM post_fts WHERE post_fts MATCH 'antigo'").all() == [(1,)]
+
+
+def test_baseline_does_not_follow_models(engine, monkeypatch):
+    # A migração 1 cria o esquema de antes das migrações, não o dos models de hoje
+    monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS[:1])
+    assert migrate(engine) == 1
+    assert set(inspect(engine).get_table_names()) == {"user", "post", "like"}
+    assert post_columns(engine) == {"id", "content", "user_id", "created_at", "updated_at"}
+
+
+def test_schema_matches_models(engine):
+    # As migrações têm DDL próprio; o resultado precisa ter tudo o que os models declaram
+    migrate(engine)
+    models = make_engine(":memory:")
+    SQLModel.metadata.create_all(models)
+    migrated, expected = schema(engine), schema(models)
+    for table, (columns, indexes, foreign_keys) in expected.items():
+        assert migrated[table][0] == columns
+        assert indexes <= migrated[table][1]
+        assert migrated[table][2] == foreign_keys
+
+
+def test_legacy_schema_same_as_fresh(engine, tmp_path):
+    migrate(engine)
+    legacy = make_engine(tmp_path / "antigo.db")
+    create_legacy(legacy)
+    migrate(legacy)
+    assert schema(legacy) == schema(engine)
+    legacy.dispose()
+
+
+def test_failed_migration_rolls_back(engine, monkeypatch):
+    migrate(engine)
+
+    def broken(connection):
+        connection.exec_driver_sql("ALTER TABLE post ADD COLUMN extra INTEGER")
+        raise RuntimeError("falha no meio da migração")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", [*migrations.MIGRATIONS, (LATEST_VERSION + 1, "quebrada", broken)])
+    with pytest.raises(RuntimeError):
+        migrate(engine)
+    assert version_of(engine) == LATEST_VERSION
+    assert "extra" not in post_columns(engine)
+
+
+def test_migration_already_applied(engine):
+    # Outro processo aplicou a migração entre a leitura das pendentes e o BEGIN IMMEDIATE
+    migrate(engine)
+    calls = []
+    with engine.connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        assert apply_migration(connection, LATEST_VERSION, calls.append) is False
+        assert apply_migration(connection, LATEST_VERSION + 1, calls.append) is True
+        assert current_version(connection) == LATEST_VERSION + 1
+    assert len(calls) == 1
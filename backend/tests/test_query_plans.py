@@ -0,0 +1,34 @@
+import pytest
+from app.db import engine
+from app.migrations import migrate
+from app.query_plans import explain, is_full_scan, router_queries
+'''
+Regressão dos planos de consulta: as queries das rotas (montadas pelos mesmos builders
+que os routers usam, ver query_plans.py) não podem fazer SCAN da tabela inteira.
+'''
+
+QUERIES = router_queries()
+
+
+@pytest.fixture(scope="module")
+def connection():
+    migrate(engine)
+    with engine.connect() as connection:
+        yield connection
+
+
+@pytest.mark.parametrize("name, statement", QUERIES, ids=[name for name, _ in QUERIES])
+def test_query_uses_index(connection, name, statement):
+    plan = explain(connection, statement)
+    assert plan
+    assert not [detail for detail in plan if is_full_scan(detail)], plan
+
+
+@pytest.mark.parametrize("detail, full_scan", [
+    ("SCAN post", True),
+    ("SCAN post USING INDEX ix_post_created_at_id", False),
+    ("SEARCH post USING INTEGER PRIMARY KEY (rowid=?)", False),
+    ("SCAN post_fts VIRTUAL TABLE INDEX 0:M2", False),
+])
+def test_is_full_scan(detail, full_scan):
+    assert is_full_scan(detail) is full_scan
@@ -0,0 +1,26 @@
+import asyncio
+from fastapi.routing import APIRoute
+from app.db import ASYNC_DB
+'''
+Rotas montadas pelo main.py: nenhuma rota repetida (mesmo caminho e método) e, com
+ASYNC_DB=1, as versões async no lugar das sync (rode a suíte nos dois modos).
+'''
+
+ASYNC_PATHS = ("/posts/feed", "/likes/batch", "/likes/summary", "/users/login")
+
+
+def api_routes(client):
+    return [route for route in client.app.routes if isinstance(route, APIRoute)]
+
+
+def test_no_duplicate_routes(client):
+    seen = [(route.path_format, method) for route in api_routes(client) for method in route.methods]
+    assert len(seen) == len(set(seen))
+
+
+def test_route_versions(client):
+    endpoints = {route.path: route.endpoint for route in api_routes(client)}
+    for path in ASYNC_PATHS:
+        assert asyncio.iscoroutinefunction(endpoints[path]) is ASYNC_DB
+    # as que só existem na versão sync continuam montadas
+    assert "/posts/search" in endpoints
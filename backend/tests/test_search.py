@@ -0,0 +1,66 @@
+import base64
+import pytest
+from app.search import SNIPPET_CLOSE, SNIPPET_OPEN, highlight, match_expression
+'''
+Busca FTS5 (GET /posts/search): o snippet é HTML com o conteúdo escapado e só os <mark>
+dos termos como tags, a sintaxe do FTS5 digitada pelo usuário não quebra a query, e a
+paginação por cursor não repete resultados.
+'''
+
+
+def search(client, q, **params):
+    return client.get("/posts/search", params={"q": q, **params})
+
+
+def test_highlight_escapes_content():
+    snippet = f"<b>oi</b> & {SNIPPET_OPEN}termo{SNIPPET_CLOSE} \"aspas\""
+    assert highlight(snippet) == "&lt;b&gt;oi&lt;/b&gt; &amp; <mark>termo</mark> &quot;aspas&quot;"
+
+
+def test_match_expression_quotes_terms():
+    assert match_expression('foo "bar" OR NEAR(x') == '"foo" """bar""" "OR" "NEAR(x"*'
+
+
+def test_snippet_is_escaped(client, create_post):
+    post = create_post('<script>alert("xss")</script> <img src=x onerror=alert(1)> vulnerabilidade')
+    results = search(client, "vulnerabilidade").json()
+    result = next(result for result in results if result["id"] == post["id"])
+
+    assert "<mark>vulnerabilidade</mark>" in result["snippet"]
+    assert "<script" not in result["snippet"] and "<img" not in result["snippet"]
+    assert "&lt;script&gt;" in result["snippet"]
+    # o content continua o texto original; só o snippet é HTML
+    assert result["content"] == post["content"]
+
+
+def test_prefix_and_accents(client, create_post):
+    post = create_post("Programação funcional em Python")
+    ids = [result["id"] for result in search(client, "programacao func").json()]
+    assert post["id"] in ids
+
+
+@pytest.mark.parametrize("q", ['"', "AND", "NEAR(", "x*)", "-foo", "col:valor"])
+def test_fts_syntax_is_literal(client, q):
+    assert search(client, q).status_code == 200
+
+
+def test_blank_query(client):
+    assert search(client, "   ").status_code == 400
+
+
+def test_cursor_pagination(client, create_post):
+    ids = {create_post(f"paginacaobusca {i}")["id"] for i in range(5)}
+    seen, cursor = [], None
+    while True:
+        response = search(client, "paginacaobusca", limit=2, **({"cursor": cursor} if cursor else {}))
+        seen += [result["id"] for result in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert sorted(seen) == sorted(ids)
+
+
+@pytest.mark.parametrize("raw", ["abc", "1.0", "nan|1", "inf|1", f"1.0|{2**63}", "x|1"])
+def test_invalid_cursor(client, raw):
+    cursor = base64.urlsafe_b64encode(raw.encode()).decode()
+    assert search(client, "qualquer", cursor=cursor).status_code == 400
@@ -0,0 +1,51 @@
+import msgpack
+import pytest
+from app.serialization import media_quality, parse_accept
+'''
+Negociação do formato das listagens (serialization.py): MessagePack só quando o Accept
+dá a ele q maior que o do JSON; sem Accept, com */* ou empate, a resposta é JSON.
+'''
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+
+
+@pytest.mark.parametrize("accept, expected", [
+    pytest.param(None, JSON, id="sem-accept"),
+    pytest.param("*/*", JSON, id="qualquer"),
+    pytest.param("application/json", JSON, id="json"),
+    pytest.param("application/msgpack", MSGPACK, id="msgpack"),
+    pytest.param("application/x-msgpack", MSGPACK, id="x-msgpack"),
+    pytest.param("application/msgpack, application/json;q=0.9", MSGPACK, id="msgpack-preferido"),
+    pytest.param("application/msgpack;q=0.5, application/json", JSON, id="json-preferido"),
+    pytest.param("application/msgpack, application/json", JSON, id="empate"),
+    pytest.param("application/msgpack;q=0", JSON, id="msgpack-recusado"),
+    pytest.param("application/msgpack; q=0.0, */*", JSON, id="recusado-com-curinga"),
+    pytest.param("application/msgpack;q=0.8, */*;q=0.1", MSGPACK, id="curinga-menor"),
+    pytest.param("application/*;q=0.9, application/json;q=0.2", MSGPACK, id="tipo-curinga"),
+    pytest.param("APPLICATION/MSGPACK;Q=1", MSGPACK, id="maiusculas"),
+    pytest.param("application/msgpack;q=abc", JSON, id="q-invalido"),
+    pytest.param("application/msgpack;q=2", JSON, id="q-fora-da-faixa"),
+    pytest.param("application/msgpack;q=nan", JSON, id="q-nan"),
+])
+def test_negotiation(client, accept, expected):
+    headers = {"Accept": accept} if accept else {}
+    response = client.get("/posts/feed", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == expected
+    assert response.headers["vary"] == "Accept"
+
+
+def test_msgpack_same_content(client, create_post):
+    create_post("post em msgpack")
+    as_json = client.get("/posts/feed").json()
+    as_msgpack = msgpack.unpackb(client.get("/posts/feed", headers={"Accept": MSGPACK}).content)
+    assert as_msgpack == as_json
+
+
+def test_media_quality():
+    ranges = parse_accept("text/html, application/*;q=0.4, */*;q=0.1, application/json;q=0")
+    assert media_quality(ranges, "application/json") == 0
+    assert media_quality(ranges, "application/msgpack") == 0.4
+    assert media_quality(ranges, "image/png") == 0.1
+    assert media_quality(parse_accept(""), "application/json") == 0
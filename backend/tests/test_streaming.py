@@ -0,0 +1,53 @@
+import orjson
+import pytest
+from app.routers import posts
+'''
+Modo NDJSON das listagens GET /posts/ e /posts/user/{user_id} (?stream=1 ou
+Accept: application/x-ndjson): um post por linha, os mesmos dados da resposta JSON,
+lidos em blocos de STREAM_CHUNK_SIZE.
+'''
+
+
+def ndjson(response):
+    assert response.headers["content-type"].startswith(posts.NDJSON_MEDIA_TYPE)
+    return [orjson.loads(line) for line in response.content.splitlines()]
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    # Blocos pequenos para a paginação pelo id passar por vários blocos
+    monkeypatch.setattr(posts, "STREAM_CHUNK_SIZE", 2)
+
+
+def test_stream_matches_json(client, create_post, small_chunks):
+    for i in range(5):
+        create_post(f"stream {i}")
+    listed = client.get("/posts/").json()
+    streamed = ndjson(client.get("/posts/", params={"stream": 1}))
+    assert streamed == listed
+    assert [post["id"] for post in streamed] == sorted(post["id"] for post in streamed)
+
+
+def test_stream_by_accept_header(client, create_post):
+    create_post()
+    response = client.get("/posts/", headers={"Accept": posts.NDJSON_MEDIA_TYPE})
+    assert ndjson(response) == client.get("/posts/").json()
+
+
+def test_user_stream(client, new_user, small_chunks):
+    author = new_user()
+    other = new_user()
+    mine = [client.post("/posts/", json={"content": f"meu {i}"}, headers=author).json()["id"] for i in range(3)]
+    client.post("/posts/", json={"content": "de outro"}, headers=other)
+    user_id = client.get("/users/me", headers=author).json()["id"]
+
+    streamed = ndjson(client.get(f"/posts/user/{user_id}", params={"stream": 1}))
+    assert [post["id"] for post in streamed] == mine
+    assert streamed == client.get(f"/posts/user/{user_id}").json()
+
+
+def test_empty_stream(client, new_user):
+    user_id = client.get("/users/me", headers=new_user()).json()["id"]
+    response = client.get(f"/posts/user/{user_id}", params={"stream": 1})
+    assert response.status_code == 200
+    assert response.content == b""
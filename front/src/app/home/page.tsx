@@ -2,7 +2,7 @@
 
 import { useState, useEffect } from "react";
 import { useRouter } from "next/navigation";
-import { getPosts, createPost, handleReaction } from "../../services/api";
+import api, { getPosts, createPost, handleReaction } from "../../services/api";
 
 type Post = {
   id: number;
@@ -45,7 +45,7 @@ export default function HomePage() {
     if (!content.trim() || !currentUser) return;
     
     try {
-      await createPost(content, currentUser.id);
+      await createPost(content);
       setContent("");
       await loadPosts();
     } catch (error) {
@@ -65,6 +65,8 @@ export default function HomePage() {
   };
 
   const handleLogout = () => {
+    api.post("/users/logout").catch(() => {});
+    localStorage.removeItem("authToken");
     localStorage.removeItem("currentUser");
     router.replace("/");
   };
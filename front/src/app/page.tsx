@@ -41,7 +41,9 @@ const handleSubmit = async (e: React.FormEvent) => {
       const result = await loginUser(form.username, form.password);
       console.log("Login result:", result); // Debugging log
       if (result.success) {
+        localStorage.setItem("authToken", result.data.access_token);
         localStorage.setItem("currentUser", JSON.stringify({
+          id: result.data.user_id,
           username: form.username,
         }));
         console.log("Redirecting to /home...");
@@ -50,12 +50,10 @@ export const getPosts = async () => {
   }
 };
 
-export const createPost = async (content: string, userId: number) => {
+// O autor do post é o usuário do token (header Authorization)
+export const createPost = async (content: string) => {
   try {
-    const response = await api.post("/posts", {
-      content,
-      user_id: userId
-    });
+    const response = await api.post("/posts/", { content });
     return response.data;
   } catch (error: any) {
     throw new Error(error.response?.data?.detail || "Failed to create post");